@@ -1,16 +1,364 @@
 import requests
-from typing import List, Dict, Optional, Any
-from PIL import Image, ImageTk
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Optional, Iterator, Tuple
+from PIL import Image, ImageDraw, ImageFont, ImageTk
+import copy
+import functools
 import io
-import urllib.request
-import urllib.error
 import json
+import math
+import random
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from recipe_model import Recipe
+from rate_limiter import QuotaRateLimiter, QuotaExhaustedError, get_rate_limiter
+from circuit_breaker import CircuitBreaker, CircuitOpenError, LatencyTracker
+from thumbnail_cache import ThumbnailCache, get_shared_thumbnail_cache
+
+# رموز الحالة التي تستحق إعادة المحاولة (تجاوز الحد أو خطأ مؤقت في الخادم)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# أحجام صور الوصفات التي يولّدها Spoonacular (مرتبة من الأصغر)
+RECIPE_IMAGE_SIZES = ((90, 90), (240, 150), (312, 150), (312, 231), (480, 360), (556, 370), (636, 393))
+IMAGE_SIZE_PATTERN = re.compile(r'-(\d+)x(\d+)\.(\w+)$')
+
+def sized_image_url(url: str, size: tuple) -> str:
+    """رابط أصغر نسخة من الصورة تغطي حجم العرض المطلوب (أو الرابط الأصلي)"""
+    match = IMAGE_SIZE_PATTERN.search(url or '')
+    if not match:
+        return url
+    original_width, original_height = int(match.group(1)), int(match.group(2))
+    for width, height in RECIPE_IMAGE_SIZES:
+        if width >= size[0] and height >= size[1]:
+            if width * height >= original_width * original_height:
+                return url
+            return f"{url[:match.start()]}-{width}x{height}.{match.group(3)}"
+    return url
+
+# مدة تذكّر روابط الصور المفقودة (404) حتى لا نعيد طلبها في كل بحث
+MISSING_IMAGE_TTL = 60 * 60
+
+@functools.lru_cache(maxsize=16)
+def load_placeholder_font(font_size: int):
+    """الخط المستخدم في الصورة الافتراضية (يُبحث عنه مرة واحدة لكل حجم)"""
+    for font_name in ("arial.ttf", "DejaVuSans.ttf"):
+        try:
+            return ImageFont.truetype(font_name, font_size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+@functools.lru_cache(maxsize=16)
+def render_placeholder(size: tuple) -> Image.Image:
+    """رسم الصورة الافتراضية مرة واحدة لكل حجم (لا تُعدَّل بعد إنشائها)"""
+    # إنشاء صورة جديدة باللون الرمادي
+    image = Image.new('RGB', size, color='#F0F0F0')
+    draw = ImageDraw.Draw(image)
+    font = load_placeholder_font(max(1, min(size) // 8))
+    
+    text = "No Image"
+    text_bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = text_bbox[2] - text_bbox[0]
+    text_height = text_bbox[3] - text_bbox[1]
+    
+    # حساب الموقع المركزي
+    x = (size[0] - text_width) // 2
+    y = (size[1] - text_height) // 2
+    
+    draw.text((x, y), text, fill='#666666', font=font)
+    return image
+
+def normalize_ingredients(ingredients: str) -> str:
+    """توحيد نص المكونات: أحرف صغيرة، بدون تكرار، ومرتبة"""
+    items = {item.strip().lower() for item in ingredients.split(',')}
+    return ",".join(sorted(item for item in items if item))
+
+class SearchResultCache:
+    """ذاكرة مؤقتة محدودة الحجم لنتائج البحث مع مدة صلاحية"""
+    
+    def __init__(self, ttl: float = 30 * 60, max_entries: int = 128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+    def get(self, key, allow_stale: bool = False) -> Optional[List[Recipe]]:
+        """إرجاع نسخة من النتائج المخزنة إذا كانت صالحة (أو منتهية عند تعطل الخادم)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, recipes = entry
+            if time.monotonic() - stored_at > self.ttl and not allow_stale:
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(recipes)
+        
+    def put(self, key, recipes: List[Recipe]):
+        """تخزين النتائج مع حذف الأقدم استخداماً عند تجاوز الحد"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(recipes))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                
+    def clear(self):
+        """مسح كل النتائج المخزنة"""
+        with self._lock:
+            self._entries.clear()
+
+# ذاكرة مشتركة بين كل كائنات RecipeAPIHandler (الواجهة وأي مستدعٍ آخر)
+shared_search_cache = SearchResultCache()
+
+class SingleFlight:
+    """دمج الطلبات المتطابقة المتزامنة: طلب واحد فعلي وكل المنتظرين يأخذون نتيجته"""
+    
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        
+    def do(self, key, func):
+        """تنفيذ func مرة واحدة لكل مفتاح قيد التنفيذ"""
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+        
+        # المنتظرون يحصلون على نفس النتيجة أو نفس الاستثناء
+        if not is_leader:
+            return future.result()
+        
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+# ملفات تعريف الحقول: ما يُطلب من الخادم وما يُحتفظ به من كل وصفة
+CARD_FIELDS = (
+    'id', 'title', 'image', 'imageType', 'readyInMinutes', 'servings',
+    'usedIngredientCount', 'missedIngredientCount', 'usedIngredients', 'missedIngredients'
+)
+DETAIL_FIELDS = CARD_FIELDS + (
+    'summary', 'instructions', 'sourceUrl', 'spoonacularSourceUrl', 'healthScore',
+    'pricePerServing', 'diets', 'dishTypes', 'cuisines', 'extendedIngredients', 'analyzedInstructions'
+)
+FIELD_PROFILES = {
+    'card': {'include_nutrition': False, 'fields': CARD_FIELDS},
+    'detail': {'include_nutrition': False, 'fields': DETAIL_FIELDS},
+    # None = الاحتفاظ بكل شيء (بما فيه التغذية والبيانات الخام)
+    'full': {'include_nutrition': True, 'fields': None}
+}
+
+def project_recipe(recipe: Dict, profile: str = 'detail') -> Dict:
+    """الاحتفاظ بحقول ملف التعريف فقط وحذف البيانات المتداخلة غير المقروءة"""
+    fields = FIELD_PROFILES[profile]['fields']
+    if fields is None:
+        return recipe
+    
+    projected = {key: recipe[key] for key in fields if key in recipe}
+    
+    # الواجهة تقرأ الاسم فقط من مكونات نتائج البحث
+    for key in ('usedIngredients', 'missedIngredients'):
+        if key in projected:
+            projected[key] = [{'name': ing.get('name', '')} for ing in projected[key]]
+    
+    if 'extendedIngredients' in projected:
+        projected['extendedIngredients'] = [
+            {key: ing.get(key) for key in ('id', 'name', 'original', 'amount', 'unit')}
+            for ing in projected['extendedIngredients']
+        ]
+    
+    if 'analyzedInstructions' in projected:
+        projected['analyzedInstructions'] = [
+            {
+                'name': section.get('name', 'Instructions'),
+                'steps': [
+                    {'number': step.get('number', 0), 'step': step.get('step', '')}
+                    for step in section.get('steps', [])
+                ]
+            }
+            for section in projected['analyzedInstructions']
+        ]
+    
+    return projected
 
 class RecipeAPIHandler:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, max_concurrency: int = 5, detail_timeout: float = 10,
+                 bulk_chunk_size: int = 50, pool_size: int = 10, max_retries: int = 3,
+                 backoff_factor: float = 0.5, detail_cache=None,
+                 search_cache: Optional[SearchResultCache] = None, detail_profile: str = 'detail',
+                 rate_limiter: Optional[QuotaRateLimiter] = None, hedge_requests: bool = True,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 thumbnail_cache: Optional[ThumbnailCache] = None):
         self.api_key = api_key
         self.base_url = "https://api.spoonacular.com"
+        # عدد طلبات التفاصيل المتزامنة والمهلة القصوى لكل طلب
+        self.max_concurrency = max(1, max_concurrency)
+        self.detail_timeout = detail_timeout
+        # الحد الأقصى لعدد المعرفات في طلب informationBulk واحد
+        self.bulk_chunk_size = max(1, bulk_chunk_size)
+        # إعدادات إعادة المحاولة مع تأخير أسي عشوائي
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        # ذاكرة تخزين دائمة للتفاصيل (DatabaseManager) تُفحص قبل الشبكة
+        self.detail_cache = detail_cache
+        # ملف تعريف الحقول الافتراضي لطلبات التفاصيل ('card' أو 'detail' أو 'full')
+        self.detail_profile = detail_profile
+        # ذاكرة نتائج البحث (المشتركة افتراضياً)
+        self.search_cache = search_cache if search_cache is not None else shared_search_cache
+        # محدد معدل الطلبات حسب نقاط Spoonacular (مشترك لكل من يستخدم نفس المفتاح)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter(api_key)
+        # مصغّرات الصور الجاهزة (ذاكرة + قرص) حسب الرابط والحجم؛ المشتركة تُنشأ عند أول صورة
+        self._thumbnail_cache = thumbnail_cache
+        # روابط الصور التي أعادت 404 مؤخراً (الرابط -> وقت انتهاء التذكّر)
+        self.missing_images = {}
+        self._missing_lock = threading.Lock()
+        # صور PhotoImage الافتراضية لكل حجم (تُنشأ في thread الواجهة فقط)
+        self._placeholder_photos = {}
+        # دمج الطلبات المتطابقة المتزامنة (نفس الرابط ونفس المعاملات)
+        self.single_flight = SingleFlight()
+        # طلب احتياطي بعد تأخير p95، وقاطع دائرة يرفض الطلبات فوراً عند تعطل الخادم
+        self.hedge_requests = hedge_requests
+        self.latency_tracker = LatencyTracker()
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        # جلسة HTTP مشتركة لكل الطلبات (JSON والصور) لإعادة استخدام الاتصالات
+        pool_size = max(pool_size, self.max_concurrency)
+        self.session = self._create_session(pool_size)
+        self._hedge_executor = ThreadPoolExecutor(max_workers=pool_size)
+        
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """إنشاء جلسة HTTP مع تجمع اتصالات دائمة"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+        return session
+        
+    def close(self):
+        """إغلاق الجلسة وتحرير الاتصالات"""
+        self._hedge_executor.shutdown(wait=False)
+        self.session.close()
+        
+    @property
+    def thumbnail_cache(self) -> ThumbnailCache:
+        if self._thumbnail_cache is None:
+            self._thumbnail_cache = get_shared_thumbnail_cache()
+        return self._thumbnail_cache
+        
+    def _get(self, url: str, params: Optional[Dict] = None, timeout: float = 10,
+             hedge: bool = True) -> requests.Response:
+        """طلب GET عبر الجلسة المشتركة (الطلبات المتطابقة المتزامنة تُدمج في طلب واحد)"""
+        key = self._request_key(url, params)
+        return self.single_flight.do(key, lambda: self._get_with_retry(url, params, timeout, hedge))
+        
+    @staticmethod
+    def _request_key(url: str, params: Optional[Dict]) -> Tuple:
+        """مفتاح دمج الطلبات المتطابقة (نفس الرابط ونفس المعاملات)"""
+        return (url, tuple(sorted((params or {}).items())))
+        
+    def _get_with_retry(self, url: str, params: Optional[Dict], timeout: float,
+                        hedge: bool = True) -> requests.Response:
+        """طلب GET مع إعادة المحاولة عند 429/5xx"""
+        # طلبات الصور لا تستهلك نقاطاً من حصة API ولا تمر بقاطع الدائرة
+        is_api_call = url.startswith(self.base_url)
+        for attempt in range(self.max_retries + 1):
+            if is_api_call and not self.circuit_breaker.allow_request():
+                raise CircuitOpenError(f"Spoonacular is unavailable, skipped {url}")
+            try:
+                if is_api_call:
+                    response = self._send_hedged(url, params, timeout, hedge)
+                else:
+                    response = self.session.get(url, params=params, timeout=timeout)
+            except requests.RequestException as e:
+                if is_api_call:
+                    self.circuit_breaker.record_failure()
+                if not isinstance(e, requests.ConnectionError) or attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt)
+            else:
+                if is_api_call:
+                    if response.status_code >= 500:
+                        self.circuit_breaker.record_failure()
+                    else:
+                        self.circuit_breaker.record_success()
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                delay = self._retry_delay(attempt, response.headers)
+                if delay is None:
+                    # الخادم يطلب انتظاراً أطول من الحد: نعيد الاستجابة بدل تجميد العامل
+                    return response
+                response.close()
+            
+            time.sleep(delay)
+            
+    def _send_hedged(self, url: str, params: Optional[Dict], timeout: float,
+                     hedge: bool = True) -> requests.Response:
+        """إرسال طلب API مع نسخة احتياطية إذا تأخر الأول عن p95"""
+        self.rate_limiter.acquire(url, params)
+        if not (self.hedge_requests and hedge):
+            return self._timed_get(url, params, timeout)
+        
+        primary = self._hedge_executor.submit(self._timed_get, url, params, timeout)
+        try:
+            return primary.result(timeout=self.latency_tracker.hedge_delay())
+        except FuturesTimeoutError:
+            pass
+        
+        # الطلب الأول متأخر: نرسل نسخة ثانية ونأخذ أول استجابة ناجحة
+        try:
+            self.rate_limiter.acquire(url, params)
+        except QuotaExhaustedError:
+            # الحصة لا تكفي لنسخة ثانية: ننتظر الطلب الأول فقط
+            return primary.result()
+        hedge = self._hedge_executor.submit(self._timed_get, url, params, timeout)
+        error = None
+        for future in as_completed([primary, hedge]):
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        raise error
+        
+    def _timed_get(self, url: str, params: Optional[Dict], timeout: float) -> requests.Response:
+        """طلب API واحد مع تسجيل زمن الاستجابة وترويسات الحصة"""
+        started_at = time.monotonic()
+        response = self.session.get(url, params=params, timeout=timeout)
+        self.rate_limiter.record_response(response.status_code, response.headers)
+        if response.status_code < 500:
+            self.latency_tracker.record(time.monotonic() - started_at)
+        return response
+        
+    def _retry_delay(self, attempt: int, headers=None) -> Optional[float]:
+        """حساب مدة الانتظار قبل إعادة المحاولة (Full Jitter)، أو None إذا طلب الخادم انتظاراً أطول من الحد"""
+        # احترام Retry-After إذا أرسله الخادم، بحد أقصى حتى لا يتجمد العامل (أو الواجهة عند التحقق من المفتاح)
+        if headers is not None:
+            retry_after = headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = float(retry_after)
+                return delay if delay <= self.backoff_factor * (2 ** self.max_retries) else None
+        return random.uniform(0, self.backoff_factor * (2 ** attempt))
+        
+    def get_quota_status(self) -> Dict:
+        """حالة حصة النقاط المتبقية"""
+        return self.rate_limiter.get_status()
         
     def validate_api_key(self) -> bool:
         """التحقق من صحة مفتاح API"""
@@ -18,81 +366,276 @@ class RecipeAPIHandler:
         params = {"apiKey": self.api_key, "number": 1}
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            # بدون طلب احتياطي: التحقق يعمل في thread الواجهة ونسخة ثانية تستهلك نقاطاً إضافية
+            response = self._get(url, params=params, timeout=10, hedge=False)
             return response.status_code == 200
-        except requests.RequestException:
+        except (requests.RequestException, CircuitOpenError):
+            # CircuitOpenError يشمل QuotaExhaustedError
             return False
             
-    def fetch_recipes_by_ingredients(self, ingredients: str, number: int = 10) -> List[Dict]:
+    def fetch_recipes_by_ingredients(self, ingredients: str, number: int = 10, ranking: int = 2,
+                                     include_details: bool = True) -> List[Recipe]:
         """جلب وصفات بناءً على المكونات"""
+        ranked = sorted(
+            self._iter_ranked_recipes(ingredients, number, ranking, include_details),
+            key=lambda item: item[0]
+        )
+        return [recipe for _, recipe in ranked]
+        
+    def iter_recipes_by_ingredients(self, ingredients: str, number: int = 10, ranking: int = 2,
+                                    include_details: bool = True) -> Iterator[Recipe]:
+        """جلب الوصفات كمولّد: تُعاد كل وصفة بمجرد وصول تفاصيلها"""
+        for _, recipe in self._iter_ranked_recipes(ingredients, number, ranking, include_details):
+            yield recipe
+            
+    def _iter_ranked_recipes(self, ingredients: str, number: int, ranking: int,
+                             include_details: bool) -> Iterator[Tuple[int, Recipe]]:
+        """إرجاع (الترتيب، الوصفة) بترتيب وصول التفاصيل"""
+        # نفس المكونات بترتيب مختلف تعطي نفس مفتاح التخزين
+        ingredients = normalize_ingredients(ingredients)
+        cache_key = (ingredients, number, ranking, include_details)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            yield from enumerate(cached)
+            return
+        
+        url, params = self._build_search_request(ingredients, number, ranking)
+    
+        try:
+            response = self._get(url, params=params, timeout=15)
+            response.raise_for_status()
+            recipes = response.json()
+        except CircuitOpenError as e:
+            # الخادم متعطل: نعرض آخر نتائج مخزنة لنفس البحث حتى لو انتهت صلاحيتها
+            print(f"API Error: {e}")
+            stale = self.search_cache.get(cache_key, allow_stale=True)
+            if stale is not None:
+                yield from enumerate(stale)
+            return
+        except Exception as e:
+            print(f"API Error: {e}")
+            return
+        
+        detailed_recipes = self._summaries_to_recipes(recipes)
+        
+        # بدون تفاصيل: البطاقات تُعرض من الملخص وتُجلب التفاصيل عند الطلب
+        if not include_details:
+            yield from enumerate(detailed_recipes)
+            if detailed_recipes:
+                self.search_cache.put(cache_key, detailed_recipes)
+            return
+        
+        # جلب تفاصيل كاملة لكل وصفة ودمجها فور وصول كل دفعة
+        pending = {recipe.id: index for index, recipe in enumerate(detailed_recipes) if recipe.id}
+        for details_list in self._iter_recipe_details(list(pending), self.detail_timeout, self.detail_profile):
+            for full_details in details_list:
+                index = pending.pop(full_details.id, None)
+                if index is not None:
+                    detailed_recipes[index].merge_details(full_details)  # دمج التفاصيل الكاملة
+                    yield index, detailed_recipes[index]
+        
+        # الوصفات التي فشل جلب تفاصيلها تبقى بالبيانات المختصرة فقط
+        unresolved = set(pending.values())
+        for index, recipe in enumerate(detailed_recipes):
+            if index in unresolved or not recipe.id:
+                yield index, recipe
+        
+        # نتائج ناقصة التفاصيل لا تُخزن حتى يعيد البحث التالي المحاولة
+        if detailed_recipes and not pending:
+            self.search_cache.put(cache_key, detailed_recipes)
+            
+    def _build_search_request(self, ingredients: str, number: int, ranking: int) -> Tuple[str, Dict]:
+        """رابط ومعاملات طلب البحث بالمكونات"""
         url = f"{self.base_url}/recipes/findByIngredients"
         params = {
             "ingredients": ingredients,
             "number": number,
             "apiKey": self.api_key,
-            "ranking": 2,
+            "ranking": ranking,
             "ignorePantry": False
         }
-    
-          # جلب تفاصيل كاملة لكل وصفة
+        return url, params
+        
+    def _summaries_to_recipes(self, recipes: List[Dict]) -> List[Recipe]:
+        """تحويل نتائج البحث إلى وصفات مختصرة"""
+        # نحدد 5 وصفات فقط لتجنب طلبات كثيرة، ونحتفظ بحقول البطاقة فقط
+        return [Recipe.from_dict(project_recipe(recipe, 'card')) for recipe in recipes[:5]]
+        
+    def _iter_concurrently(self, func, items: List, timeout: float) -> Iterator:
+        """تنفيذ دالة على عدة عناصر بالتوازي وإرجاع كل نتيجة فور اكتمالها"""
+        if not items:
+            return
+        
+        workers = min(self.max_concurrency, len(items))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(func, item, timeout) for item in items]
+        # المهلة الكلية = مهلة الطلب الواحد × عدد الدفعات المتتالية
+        deadline = timeout * math.ceil(len(items) / workers)
         try:
-            response = requests.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            recipes = response.json()
+            for future in as_completed(futures, timeout=deadline):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    print(f"Concurrent request failed: {e}")
+        except FuturesTimeoutError:
+            print(f"Concurrent requests timed out after {deadline}s")
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
             
-            detailed_recipes = []
-            for recipe in recipes[:5]:  # نحدد 5 وصفات فقط لتجنب طلبات كثيرة
-                recipe_id = recipe.get('id')
-                if recipe_id:
-                    full_details = self.get_recipe_details(recipe_id)
-                    if full_details:
-                        recipe.update(full_details)  # دمج التفاصيل الكاملة
-                detailed_recipes.append(recipe)
+    def get_recipe_details(self, recipe_id: int, timeout: float = 10,
+                           profile: Optional[str] = None) -> Optional[Recipe]:
+        """الحصول على تفاصيل كاملة للوصفة"""
+        profile = profile or self.detail_profile
+        cached = self._read_detail_cache([recipe_id], profile)
+        if recipe_id in cached:
+            return cached[recipe_id]
+        
+        url, params = self._build_details_request(recipe_id, profile)
+        #   تنسيق بيانات الوصفة     
+        try:
+            response = self._get(url, params=params, timeout=timeout)
+            response.raise_for_status()
+            details = self._format_recipe_details(response.json(), profile)
+            self._write_detail_cache([details], profile)
+            return details
             
-            return detailed_recipes
+        except CircuitOpenError as e:
+            print(f"Error fetching recipe details {recipe_id}: {e}")
+            return self._read_stale_details([recipe_id]).get(recipe_id)
         except Exception as e:
-            print(f"API Error: {e}")
-            return []
+            print(f"Error fetching recipe details {recipe_id}: {e}")
+            return None
             
-            """الحصول على تفاصيل كاملة للوصفة""" 
-    def get_recipe_details(self, recipe_id: int) -> Dict[str, Any]:
+    def _build_details_request(self, recipe_id: int, profile: str) -> Tuple[str, Dict]:
+        """رابط ومعاملات طلب تفاصيل وصفة واحدة"""
         url = f"{self.base_url}/recipes/{recipe_id}/information"
         params = {
             "apiKey": self.api_key,
-            "includeNutrition": True
+            "includeNutrition": FIELD_PROFILES[profile]['include_nutrition']
         }
-        #   تنسيق بيانات الوصفة     
+        return url, params
+        
+    def get_recipe_details_bulk(self, recipe_ids: List[int], timeout: float = 10,
+                                profile: Optional[str] = None) -> List[Recipe]:
+        """الحصول على تفاصيل عدة وصفات بطلب واحد لكل دفعة (informationBulk)"""
+        details_by_id = {}
+        for details_list in self._iter_recipe_details(recipe_ids, timeout, profile or self.detail_profile):
+            for details in details_list:
+                details_by_id[details.id] = details
+        
+        # إعادة الترتيب حسب ترتيب المعرفات الأصلي
+        return [details_by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in details_by_id]
+        
+    def _iter_recipe_details(self, recipe_ids: List[int], timeout: float,
+                             profile: str) -> Iterator[List[Recipe]]:
+        """إرجاع التفاصيل على دفعات: المخزنة أولاً ثم كل دفعة من الشبكة فور وصولها"""
+        cached = self._read_detail_cache(recipe_ids, profile)
+        if cached:
+            yield [cached[recipe_id] for recipe_id in recipe_ids if recipe_id in cached]
+        
+        # تقسيم المعرفات الناقصة إلى دفعات وجلبها بالتوازي إذا كانت أكثر من دفعة
+        missing_ids = [recipe_id for recipe_id in recipe_ids if recipe_id not in cached]
+        chunks = [
+            missing_ids[i:i + self.bulk_chunk_size]
+            for i in range(0, len(missing_ids), self.bulk_chunk_size)
+        ]
+        fetch_chunk = lambda chunk, chunk_timeout: self._fetch_details_chunk(chunk, chunk_timeout, profile)
+        if len(chunks) == 1:
+            results = iter([fetch_chunk(chunks[0], timeout)])
+        else:
+            results = self._iter_concurrently(fetch_chunk, chunks, timeout)
+        
+        for fetched in results:
+            self._write_detail_cache(fetched, profile)
+            yield fetched
+        
+    def _fetch_details_chunk(self, recipe_ids: List[int], timeout: float = 10,
+                             profile: str = 'detail') -> List[Recipe]:
+        """جلب دفعة واحدة من التفاصيل"""
+        url, params = self._build_bulk_request(recipe_ids, profile)
+        
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self._get(url, params=params, timeout=timeout)
             response.raise_for_status()
-            data = response.json()
+            return [self._format_recipe_details(data, profile) for data in response.json() if data.get('id')]
             
-            # تنسيق البيانات للاستخدام في التطبيق
-            formatted_data = {
-                'id': data.get('id'),
-                'title': data.get('title', 'No Title'),
-                'image': data.get('image', ''),
-                'summary': self._clean_html(data.get('summary', '')),
-                'instructions': self._clean_html(data.get('instructions', '')),
-                'readyInMinutes': data.get('readyInMinutes', 0),
-                'servings': data.get('servings', 0),
-                'sourceUrl': data.get('sourceUrl', ''),
-                'spoonacularSourceUrl': data.get('spoonacularSourceUrl', ''),
-                'healthScore': data.get('healthScore', 0),
-                'pricePerServing': data.get('pricePerServing', 0),
-                'diets': data.get('diets', []),
-                'dishTypes': data.get('dishTypes', []),
-                'cuisines': data.get('cuisines', []),
-                'extendedIngredients': self._format_ingredients(data.get('extendedIngredients', [])),
-                'analyzedInstructions': self._format_instructions(data.get('analyzedInstructions', [])),
-                'full_details': json.dumps(data)  # حفظ التفاصيل الكاملة كـ JSON
-            }
+        except CircuitOpenError as e:
+            print(f"Error fetching bulk recipe details {recipe_ids}: {e}")
+            return list(self._read_stale_details(recipe_ids).values())
+        except Exception as e:
+            print(f"Error fetching bulk recipe details {recipe_ids}: {e}")
+            return []
             
-            return formatted_data
+    def _build_bulk_request(self, recipe_ids: List[int], profile: str) -> Tuple[str, Dict]:
+        """رابط ومعاملات طلب informationBulk لدفعة واحدة"""
+        url = f"{self.base_url}/recipes/informationBulk"
+        params = {
+            "apiKey": self.api_key,
+            "ids": ",".join(str(recipe_id) for recipe_id in recipe_ids),
+            "includeNutrition": FIELD_PROFILES[profile]['include_nutrition']
+        }
+        return url, params
+        
+    def _read_detail_cache(self, recipe_ids: List[int], profile: str) -> Dict[int, Recipe]:
+        """قراءة التفاصيل المخزنة مؤقتاً (إن وجدت ذاكرة تخزين)"""
+        # الذاكرة تحفظ ملف 'detail' فقط، فلا تكفي لطلبات 'full'
+        if self.detail_cache is None or profile == 'full':
+            return {}
+        try:
+            return self.detail_cache.get_cached_recipes(recipe_ids)
+        except Exception as e:
+            print(f"Detail cache read failed: {e}")
+            return {}
             
+    def _read_stale_details(self, recipe_ids: List[int]) -> Dict[int, Recipe]:
+        """قراءة التفاصيل المخزنة حتى المنتهية صلاحيتها (عند تعطل الخادم)"""
+        if self.detail_cache is None:
+            return {}
+        try:
+            return self.detail_cache.get_cached_recipes(recipe_ids, allow_stale=True)
         except Exception as e:
-            print(f"Error fetching recipe details {recipe_id}: {e}")
+            print(f"Detail cache read failed: {e}")
             return {}
+            
+    def _write_detail_cache(self, details_list: List[Recipe], profile: str):
+        """حفظ التفاصيل المجلوبة في ذاكرة التخزين"""
+        if self.detail_cache is None or not details_list or profile != 'detail':
+            return
+        try:
+            self.detail_cache.cache_recipes(details_list)
+        except Exception as e:
+            print(f"Detail cache write failed: {e}")
+            
+    def _format_recipe_details(self, data: Dict, profile: str = 'detail') -> Recipe:
+        """تنسيق بيانات الوصفة للاستخدام في التطبيق"""
+        formatted = {
+            'id': data.get('id'),
+            'title': data.get('title', 'No Title'),
+            'image': data.get('image', ''),
+            'imageType': data.get('imageType', ''),
+            'summary': self._clean_html(data.get('summary', '')),
+            'instructions': self._clean_html(data.get('instructions', '')),
+            'readyInMinutes': data.get('readyInMinutes', 0),
+            'servings': data.get('servings', 0),
+            'sourceUrl': data.get('sourceUrl', ''),
+            'spoonacularSourceUrl': data.get('spoonacularSourceUrl', ''),
+            'healthScore': data.get('healthScore', 0),
+            'pricePerServing': data.get('pricePerServing', 0),
+            'diets': data.get('diets', []),
+            'dishTypes': data.get('dishTypes', []),
+            'cuisines': data.get('cuisines', []),
+            'extendedIngredients': self._format_ingredients(data.get('extendedIngredients', [])),
+            'analyzedInstructions': self._format_instructions(data.get('analyzedInstructions', []))
+        }
+        
+        # التغذية والبيانات الخام تُحفظ فقط لملف 'full'
+        if profile == 'full':
+            formatted['nutrition'] = data.get('nutrition', {})
+            formatted['full_details'] = json.dumps(data)  # حفظ التفاصيل الكاملة كـ JSON
+        
+        return Recipe.from_dict(project_recipe(formatted, profile))
         
         """تنظيف النص من HTML tags"""    
     def _clean_html(self, html_text: str) -> str:
@@ -145,87 +688,113 @@ class RecipeAPIHandler:
             })
         return formatted
         
-    def format_recipe_display(self, recipe: Dict) -> str:
+    def format_recipe_display(self, recipe: Recipe) -> str:
         """تنسيق عرض الوصفة"""
-        title = recipe.get('title', 'No Title')
-        used_count = recipe.get('usedIngredientCount', 0)
-        missed_count = recipe.get('missedIngredientCount', 0)
+        title = recipe.title
+        used_count = recipe.used_ingredient_count
+        missed_count = recipe.missed_ingredient_count
         
         return f"• {title} (✓ {used_count} | ✗ {missed_count})"
         
     def load_image_from_url(self, url: str, size: tuple = (100, 100)):
-        """تحميل صورة من رابط"""
+        """تحميل صورة من رابط (PhotoImage: يُستدعى من thread الواجهة فقط)"""
+        return ImageTk.PhotoImage(self.load_thumbnail(url, size))
+        
+    def load_thumbnail(self, url: str, size: tuple = (100, 100)) -> Image.Image:
+        """تحميل مصغّرة كصورة PIL (آمن للاستدعاء من العمال، بدون كائنات Tk)"""
         try:
             # تحقق إذا كان الرابط موجوداً
-            if not url or "spoonacular" not in url:
-                return self.create_default_image(size)
+            if not url or "spoonacular" not in url or self.is_missing_image(url):
+                return self.draw_default_image(size)
                 
-            # إضافة headers لتجنب بعض الأخطاء
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
+            return self.get_thumbnail(url, size)
             
-            req = urllib.request.Request(url, headers=headers)
-            with urllib.request.urlopen(req, timeout=5) as response:
-                image_data = response.read()
-            
-            image = Image.open(io.BytesIO(image_data))
-            image = image.resize(size, Image.Resampling.LANCZOS)
-            return ImageTk.PhotoImage(image)
-            
-        except urllib.error.HTTPError as e:
+        except requests.HTTPError as e:
             # خطأ HTTP (مثل 404)
-            if e.code == 404:
+            status_code = e.response.status_code
+            if status_code == 404:
                 print(f"Image not found (404): {url}")
+                self.mark_missing_image(url)
             else:
-                print(f"HTTP Error {e.code} for image: {url}")
-            return self.create_default_image(size)
+                print(f"HTTP Error {status_code} for image: {url}")
+            return self.draw_default_image(size)
             
-        except urllib.error.URLError as e:
-            # خطأ في URL
-            print(f"URL Error for image {url}: {e.reason}")
-            return self.create_default_image(size)
+        except requests.RequestException as e:
+            # خطأ في الاتصال
+            print(f"Request Error for image {url}: {e}")
+            return self.draw_default_image(size)
             
         except Exception as e:
             # أي خطأ آخر
             print(f"Error loading image from {url}: {str(e)}")
-            return self.create_default_image(size)
+            return self.draw_default_image(size)
+            
+    def is_missing_image(self, url: str) -> bool:
+        """هل أعاد هذا الرابط 404 مؤخراً؟"""
+        with self._missing_lock:
+            expires_at = self.missing_images.get(url)
+            if expires_at is None:
+                return False
+            if time.monotonic() > expires_at:
+                del self.missing_images[url]
+                return False
+            return True
             
+    def mark_missing_image(self, url: str):
+        """تذكّر رابط صورة غير موجودة لمدة MISSING_IMAGE_TTL"""
+        with self._missing_lock:
+            self.missing_images[url] = time.monotonic() + MISSING_IMAGE_TTL
+            
+    def get_thumbnail(self, url: str, size: tuple = (100, 100)) -> Image.Image:
+        """مصغّرة الصورة من الذاكرة المؤقتة، أو تحميلها وتصغيرها وتخزينها"""
+        size = tuple(size)
+        image = self.thumbnail_cache.get(url, size)
+        if image is None:
+            image = self._decode_image(self._download_image(url, size), size)
+            self.thumbnail_cache.put(url, size, image)
+        return image
+        
+    def _download_image(self, url: str, size: tuple) -> bytes:
+        """تحميل أصغر نسخة مناسبة من الصورة، والرجوع للأصلية إذا لم تكن موجودة"""
+        variant_url = sized_image_url(url, size)
+        response = self._get(variant_url, timeout=5)
+        if response.status_code == 404 and variant_url != url:
+            response = self._get(url, timeout=5)
+        response.raise_for_status()
+        return response.content
+        
+    def _decode_image(self, image_data: bytes, size: tuple) -> Image.Image:
+        """فك ترميز الصورة وتصغيرها للحجم المطلوب"""
+        image = Image.open(io.BytesIO(image_data))
+        # JPEG: المفكك نفسه يصغّر بمعامل 1/2 أو 1/4 أو 1/8 دون فك الصورة كاملة
+        image.draft('RGB', size)
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        # تصغير صحيح سريع (متوسط كتل) ثم إعادة عينة دقيقة للحجم النهائي فقط
+        factor = min(image.width // size[0], image.height // size[1])
+        if factor >= 2:
+            image = image.reduce(factor)
+        return image.resize(size, Image.Resampling.LANCZOS)
+        
     def create_default_image(self, size: tuple = (100, 100)):
         """إنشاء صورة افتراضية"""
-        # إنشاء صورة جديدة باللون الرمادي
-        image = Image.new('RGB', size, color='#F0F0F0')
+        size = tuple(size)
+        photo = self._placeholder_photos.get(size)
+        if photo is None:
+            photo = ImageTk.PhotoImage(self.draw_default_image(size))
+            self._placeholder_photos[size] = photo
+        return photo
         
-        # لرسم نص على الصورة
-        from PIL import ImageDraw, ImageFont
+    def draw_default_image(self, size: tuple = (100, 100)) -> Image.Image:
+        """الصورة الافتراضية كصورة PIL (مشتركة لكل حجم)"""
+        return render_placeholder(tuple(size))
         
-        draw = ImageDraw.Draw(image)
-        
-        # كتابة نص على الصورة
-        try:
-            # محاولة استخدام خط أكبر
-            font_size = min(size) // 8
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            # إذا فشل، استخدم الخط الافتراضي
-            font = ImageFont.load_default()
-        
-        text = "No Image"
-        text_bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        # حساب الموقع المركزي
-        x = (size[0] - text_width) // 2
-        y = (size[1] - text_height) // 2
-        
-        draw.text((x, y), text, fill='#666666', font=font)
-        return ImageTk.PhotoImage(image)
-        
-    def get_recipe_image_url(self, recipe: Dict) -> str:
+    def get_recipe_image_url(self, recipe: Recipe) -> str:
         """الحصول على رابط صورة الوصفة"""
-        # محاولة الحصول على الصورة من مصادر مختلفة
-        image = recipe.get('image')
+        return self.resolve_image_url(recipe.image)
+        
+    def resolve_image_url(self, image: str) -> str:
+        """تحويل قيمة صورة مخزنة (كاملة أو اسم ملف) إلى رابط"""
         if image:
             # بعض الصور تأتي كاملة، بعضها جزئية
             if image.startswith('http'):
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import threading
+from typing import List, Dict, Optional, Tuple
+from PIL import Image
+from api_handler import RecipeAPIHandler, RETRY_STATUS_CODES, normalize_ingredients, sized_image_url
+from recipe_model import Recipe
+from circuit_breaker import CircuitOpenError
+
+# aiohttp اختياري: بدونه تُنفَّذ الطلبات عبر الجلسة المتزامنة في executor
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class AsyncRecipeAPIHandler:
+    """نسخة asyncio من RecipeAPIHandler بنفس الواجهة"""
+
+    def __init__(self, api_key: str, max_concurrency: int = 20,
+                 handler: Optional[RecipeAPIHandler] = None, **handler_options):
+        # المعالج المتزامن يوفر التنسيق والذاكرات المؤقتة ومحدد المعدل المشتركة
+        self.handler = handler if handler is not None else RecipeAPIHandler(api_key, **handler_options)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._session = None
+        # الطلبات المتطابقة قيد التنفيذ (مثل RecipeAPIHandler.single_flight لكن داخل الحلقة)
+        self._in_flight = {}
+
+    async def _get_session(self):
+        """إنشاء جلسة aiohttp داخل الحلقة الحالية عند أول استخدام"""
+        if self._session is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=dict(self.handler.session.headers)
+            )
+        return self._session
+
+    async def close(self):
+        """إغلاق جلسة aiohttp"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run_sync(self, func, *args):
+        """تنفيذ دالة متزامنة (قاعدة البيانات، محدد المعدل) خارج الحلقة"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _get(self, url: str, params: Optional[Dict] = None, timeout: float = 10) -> Tuple[int, bytes]:
+        """طلب GET غير متزامن، يعيد (رمز الحالة، المحتوى)؛ الطلبات المتطابقة المتزامنة تُدمج في طلب واحد"""
+        if aiohttp is None:
+            response = await self._run_sync(self.handler._get, url, params, timeout)
+            return response.status_code, response.content
+
+        key = self.handler._request_key(url, params)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._get_with_retry(url, params, timeout))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish_in_flight(key, done))
+        # shield: إلغاء أحد المنتظرين لا يلغي الطلب المشترك
+        return await asyncio.shield(task)
+
+    def _finish_in_flight(self, key, task):
+        self._in_flight.pop(key, None)
+        # قراءة الاستثناء حتى لا يُطبع تحذير إذا لم يبقَ منتظرون
+        if not task.cancelled():
+            task.exception()
+
+    async def _get_with_retry(self, url: str, params: Optional[Dict], timeout: float) -> Tuple[int, bytes]:
+        """طلب GET عبر aiohttp مع إعادة المحاولة عند 429/5xx"""
+        session = await self._get_session()
+        # aiohttp لا يقبل القيم المنطقية في معاملات الرابط
+        query = {key: str(value).lower() if isinstance(value, bool) else value
+                 for key, value in (params or {}).items()}
+        is_api_call = url.startswith(self.handler.base_url)
+
+        circuit_breaker = self.handler.circuit_breaker
+        for attempt in range(self.handler.max_retries + 1):
+            if is_api_call:
+                if not circuit_breaker.allow_request():
+                    raise CircuitOpenError(f"Spoonacular is unavailable, skipped {url}")
+                await self._run_sync(self.handler.rate_limiter.acquire, url, params)
+            try:
+                async with self._semaphore:
+                    async with session.get(url, params=query,
+                                           timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                        content = await response.read()
+                        status = response.status
+                        headers = response.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # كل أخطاء aiohttp تُسجَّل (وإلا بقي الطلب التجريبي في HALF_OPEN دون نتيجة)
+                if is_api_call:
+                    circuit_breaker.record_failure()
+                if not isinstance(e, aiohttp.ClientConnectionError) or attempt == self.handler.max_retries:
+                    raise
+                delay = self.handler._retry_delay(attempt)
+            else:
+                if is_api_call:
+                    self.handler.rate_limiter.record_response(status, headers)
+                    if status >= 500:
+                        circuit_breaker.record_failure()
+                    else:
+                        circuit_breaker.record_success()
+                if status not in RETRY_STATUS_CODES or attempt == self.handler.max_retries:
+                    return status, content
+                delay = self.handler._retry_delay(attempt, headers)
+                if delay is None:
+                    return status, content
+
+            await asyncio.sleep(delay)
+
+    async def _get_json(self, url: str, params: Dict, timeout: float = 10):
+        """طلب JSON مع رفع استثناء عند رموز الخطأ"""
+        status, content = await self._get(url, params, timeout)
+        if status >= 400:
+            raise RuntimeError(f"HTTP {status} for {url}")
+        return await self._run_sync(json.loads, content)
+
+    async def fetch_recipes_by_ingredients(self, ingredients: str, number: int = 10, ranking: int = 2,
+                                           include_details: bool = True) -> List[Recipe]:
+        """جلب وصفات بناءً على المكونات"""
+        ingredients = normalize_ingredients(ingredients)
+        cache_key = (ingredients, number, ranking, include_details)
+        cached = self.handler.search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        url, params = self.handler._build_search_request(ingredients, number, ranking)
+        try:
+            recipes = self.handler._summaries_to_recipes(await self._get_json(url, params, 15))
+        except CircuitOpenError as e:
+            print(f"API Error: {e}")
+            return self.handler.search_cache.get(cache_key, allow_stale=True) or []
+        except Exception as e:
+            print(f"API Error: {e}")
+            return []
+
+        complete = True
+        if include_details:
+            recipe_ids = [recipe.id for recipe in recipes if recipe.id]
+            details_list = await self.get_recipe_details_bulk(recipe_ids, self.handler.detail_timeout)
+            details_by_id = {details.id: details for details in details_list}
+            # الوصفات التي فشل جلب تفاصيلها تبقى بالبيانات المختصرة فقط
+            for recipe in recipes:
+                if recipe.id in details_by_id:
+                    recipe.merge_details(details_by_id[recipe.id])
+            complete = all(recipe_id in details_by_id for recipe_id in recipe_ids)
+
+        # نتائج ناقصة التفاصيل لا تُخزن حتى يعيد البحث التالي المحاولة
+        if recipes and complete:
+            self.handler.search_cache.put(cache_key, recipes)
+        return recipes
+
+    async def iter_recipes_by_ingredients(self, ingredients: str, number: int = 10, ranking: int = 2,
+                                          include_details: bool = True):
+        """جلب الوصفات كمولّد غير متزامن (للتسليم للواجهة وصفة وصفة عبر AsyncLoopBridge.stream)"""
+        for recipe in await self.fetch_recipes_by_ingredients(ingredients, number, ranking, include_details):
+            yield recipe
+
+    async def get_recipe_details(self, recipe_id: int, timeout: float = 10,
+                                 profile: Optional[str] = None) -> Optional[Recipe]:
+        """الحصول على تفاصيل كاملة للوصفة"""
+        profile = profile or self.handler.detail_profile
+        cached = await self._run_sync(self.handler._read_detail_cache, [recipe_id], profile)
+        if recipe_id in cached:
+            return cached[recipe_id]
+
+        url, params = self.handler._build_details_request(recipe_id, profile)
+        try:
+            data = await self._get_json(url, params, timeout)
+        except CircuitOpenError as e:
+            print(f"Error fetching recipe details {recipe_id}: {e}")
+            stale = await self._run_sync(self.handler._read_stale_details, [recipe_id])
+            return stale.get(recipe_id)
+        except Exception as e:
+            print(f"Error fetching recipe details {recipe_id}: {e}")
+            return None
+
+        details = self.handler._format_recipe_details(data, profile)
+        await self._run_sync(self.handler._write_detail_cache, [details], profile)
+        return details
+
+    async def get_recipe_details_bulk(self, recipe_ids: List[int], timeout: float = 10,
+                                      profile: Optional[str] = None) -> List[Recipe]:
+        """الحصول على تفاصيل عدة وصفات (كل الدفعات بالتوازي على نفس الحلقة)"""
+        profile = profile or self.handler.detail_profile
+        details_by_id = await self._run_sync(self.handler._read_detail_cache, recipe_ids, profile)
+
+        missing_ids = [recipe_id for recipe_id in recipe_ids if recipe_id not in details_by_id]
+        chunk_size = self.handler.bulk_chunk_size
+        chunks = [missing_ids[i:i + chunk_size] for i in range(0, len(missing_ids), chunk_size)]
+        results = await asyncio.gather(
+            *(self._fetch_details_chunk(chunk, timeout, profile) for chunk in chunks)
+        )
+
+        fetched = [details for details_list in results for details in details_list]
+        await self._run_sync(self.handler._write_detail_cache, fetched, profile)
+        for details in fetched:
+            details_by_id[details.id] = details
+
+        # إعادة الترتيب حسب ترتيب المعرفات الأصلي
+        return [details_by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in details_by_id]
+
+    async def _fetch_details_chunk(self, recipe_ids: List[int], timeout: float, profile: str) -> List[Recipe]:
+        """جلب دفعة واحدة من التفاصيل"""
+        url, params = self.handler._build_bulk_request(recipe_ids, profile)
+        try:
+            data = await self._get_json(url, params, timeout)
+        except CircuitOpenError as e:
+            print(f"Error fetching bulk recipe details {recipe_ids}: {e}")
+            stale = await self._run_sync(self.handler._read_stale_details, recipe_ids)
+            return list(stale.values())
+        except Exception as e:
+            print(f"Error fetching bulk recipe details {recipe_ids}: {e}")
+            return []
+        return [self.handler._format_recipe_details(item, profile) for item in data if item.get('id')]
+
+    async def fetch_image(self, url: str, size: tuple = (100, 100)) -> Optional[Image.Image]:
+        """تحميل صورة وتصغيرها (PhotoImage يُنشأ لاحقاً في thread الواجهة)"""
+        if not url or "spoonacular" not in url or self.handler.is_missing_image(url):
+            return None
+        size = tuple(size)
+        try:
+            image = await self._run_sync(self.handler.thumbnail_cache.get, url, size)
+            if image is not None:
+                return image
+            variant_url = sized_image_url(url, size)
+            status, content = await self._get(variant_url, timeout=5)
+            if status == 404 and variant_url != url:
+                status, content = await self._get(url, timeout=5)
+            if status >= 400:
+                print(f"HTTP Error {status} for image: {url}")
+                if status == 404:
+                    self.handler.mark_missing_image(url)
+                return None
+            image = await self._run_sync(self.handler._decode_image, content, size)
+            await self._run_sync(self.handler.thumbnail_cache.put, url, size, image)
+            return image
+        except Exception as e:
+            print(f"Error loading image from {url}: {str(e)}")
+            return None
+
+class AsyncLoopBridge:
+    """حلقة asyncio واحدة في thread خلفي تسلّم النتائج لـ Tk عبر window.after"""
+
+    def __init__(self, window):
+        self.window = window
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine, on_success=None, on_error=None):
+        """جدولة coroutine على الحلقة واستدعاء on_success/on_error في thread الواجهة"""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+        def deliver(done_future):
+            try:
+                result = done_future.result()
+            except Exception as e:
+                if on_error:
+                    self._call_in_ui(on_error, e)
+                else:
+                    print(f"Async task failed: {e}")
+            else:
+                if on_success:
+                    self._call_in_ui(on_success, result)
+
+        future.add_done_callback(deliver)
+        return future
+
+    def stream(self, async_iterable, on_item, on_done=None, on_error=None):
+        """تشغيل مولّد غير متزامن على الحلقة وتسليم كل عنصر لـ thread الواجهة فور وصوله"""
+        async def consume():
+            async for item in async_iterable:
+                self._call_in_ui(on_item, item)
+
+        # window.after ينفذ الاستدعاءات بالترتيب، فيصل on_done بعد آخر عنصر
+        return self.submit(consume(), on_success=on_done, on_error=on_error)
+
+    def _call_in_ui(self, callback, value):
+        try:
+            self.window.after(0, callback, value)
+        except Exception as e:
+            # النافذة أُغلقت قبل وصول النتيجة
+            print(f"Could not deliver async result: {e}")
+
+    def stop(self, cleanup=None):
+        """إيقاف الحلقة (مع coroutine تنظيف اختيارية مثل close())"""
+        if cleanup is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(cleanup, self.loop).result(timeout=2)
+            except Exception as e:
+                print(f"Async cleanup failed: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,106 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from database import DatabaseManager, INDEXES, MIGRATIONS, recipe_content_hash
+
+# عدد صفوف التاريخ في كل جولة، وعدد المستخدمين الذين تتوزع عليهم
+ROW_COUNTS = (10_000, 100_000, 1_000_000)
+USER_COUNT = 1000
+REPEATS = 50
+
+RECIPE_DATA = '{"id":1,"title":"Benchmark Recipe","image":"","imageType":"","readyInMinutes":30,"servings":2}'
+
+def fill_tables(db_manager, start_row, end_row):
+    """إضافة صفوف عشوائية لتاريخ البحث والمشاهدة والمفضلة"""
+    connection = db_manager.connection
+    rows = range(start_row, end_row)
+    connection.executemany(
+        "INSERT INTO search_history (user_id, ingredients, results_count, search_date) VALUES (?, ?, ?, datetime(?, 'unixepoch'))",
+        ((random.randrange(USER_COUNT), "egg,flour,milk", 5, 1_600_000_000 + row) for row in rows)
+    )
+    # كل وصفة تُشاهد 10 مرات في المتوسط، ونسختها محفوظة مرة واحدة في recipes
+    connection.executemany(
+        "INSERT INTO recipes (recipe_id, content_hash, recipe_data, updated_at) VALUES (?, ?, ?, ?)",
+        ((row, recipe_content_hash(RECIPE_DATA), db_manager.codec.encode(RECIPE_DATA), time.time()) for row in rows[::10])
+    )
+    connection.executemany(
+        "INSERT INTO view_history (user_id, recipe_id, recipe_title, viewed_at) VALUES (?, ?, ?, datetime(?, 'unixepoch'))",
+        ((random.randrange(USER_COUNT), row - row % 10, "Benchmark Recipe", 1_600_000_000 + row) for row in rows)
+    )
+    # المفضلة أقل بكثير من التاريخ (وصفة واحدة لكل 10 مشاهدات)
+    connection.executemany(
+        "INSERT OR IGNORE INTO favorites (user_id, recipe_id, recipe_title, saved_date) VALUES (?, ?, ?, datetime(?, 'unixepoch'))",
+        ((random.randrange(USER_COUNT), row, "Benchmark Recipe", 1_600_000_000 + row) for row in rows[::10])
+    )
+    connection.commit()
+
+def time_queries(db_manager):
+    """متوسط زمن كل استعلام بالمللي ثانية"""
+    queries = {
+        'get_search_history': lambda user_id: db_manager.get_search_history(user_id, limit=10),
+        'get_view_history': lambda user_id: db_manager.get_view_history(user_id, limit=20),
+        'get_favorites': lambda user_id: db_manager.get_favorites(user_id, limit=50),
+        'get_view_history_page': lambda user_id: db_manager.get_view_history_page(user_id, limit=20),
+        'get_favorites_page': lambda user_id: db_manager.get_favorites_page(user_id, limit=50),
+        'is_favorite': lambda user_id: db_manager.is_favorite(user_id, 12345)
+    }
+    results = {}
+    for name, query in queries.items():
+        started_at = time.perf_counter()
+        for _ in range(REPEATS):
+            query(random.randrange(USER_COUNT))
+        results[name] = (time.perf_counter() - started_at) / REPEATS * 1000
+    return results
+
+def drop_indexes(db_manager):
+    """حذف فهارس الترحيلات للمقارنة مع المخطط القديم"""
+    for name in INDEXES:
+        db_manager.connection.execute(f"DROP INDEX IF EXISTS {name}")
+    db_manager.connection.commit()
+
+def create_indexes(db_manager):
+    """إعادة إنشاء الفهارس فقط (دون إعادة ترحيلات البيانات أو VACUUM)"""
+    for statement in INDEXES.values():
+        db_manager.connection.execute(statement)
+    db_manager.connection.commit()
+
+def print_query_plan(db_manager):
+    plan = db_manager.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT v.id, v.recipe_title, r.image, v.viewed_at FROM view_history v "
+        "LEFT JOIN recipes r ON r.recipe_id = v.recipe_id WHERE v.user_id = ? "
+        "AND (v.viewed_at, v.id) < (?, ?) ORDER BY v.viewed_at DESC, v.id DESC LIMIT 20", (1, '2100-01-01', 0)
+    ).fetchall()
+    print("   plan:", "; ".join(row[3] for row in plan))
+
+def run_benchmark(row_counts=ROW_COUNTS):
+    random.seed(42)
+    db_path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    db_manager = DatabaseManager(db_path)
+    db_manager.create_tables_if_not_exist()
+    print(f"Benchmark database: {db_path} (schema version {MIGRATIONS[-1][0]})")
+
+    filled = 0
+    for row_count in row_counts:
+        fill_tables(db_manager, filled, row_count)
+        filled = row_count
+
+        print(f"\n📊 {row_count:,} rows per history table")
+        for label in ('without indexes', 'with indexes'):
+            if label == 'without indexes':
+                drop_indexes(db_manager)
+            else:
+                create_indexes(db_manager)
+            db_manager.connection.execute("ANALYZE")
+            results = time_queries(db_manager)
+            print(f" {label}:")
+            print_query_plan(db_manager)
+            for name, milliseconds in results.items():
+                print(f"   {name:<22} {milliseconds:8.3f} ms")
+
+    db_manager.close()
+
+if __name__ == "__main__":
+    counts = tuple(int(arg) for arg in sys.argv[1:]) or ROW_COUNTS
+    run_benchmark(counts)
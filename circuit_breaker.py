@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import deque
+
+class CircuitOpenError(Exception):
+    """الخادم غير مستقر: الطلبات مرفوضة مؤقتاً دون إرسالها"""
+    pass
+
+class CircuitBreaker:
+    """قاطع دائرة: يتوقف عن إرسال الطلبات بعد أخطاء متتالية ثم يجرّب من جديد"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """هل يُسمح بإرسال طلب الآن؟"""
+        with self._lock:
+            if self.state == self.OPEN:
+                # بعد مهلة الراحة نسمح بطلب تجريبي واحد
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            if self.state == self.HALF_OPEN:
+                # طلب تجريبي قيد التنفيذ بالفعل، إلا إذا لم تُسجَّل نتيجته خلال المهلة:
+                # نعتبره فاشلاً (OPEN انتهت مهلته) ونسمح بطلب تجريبي جديد بدل البقاء مغلقين للأبد
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.opened_at = time.monotonic()
+                return True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+class LatencyTracker:
+    """تتبع أزمنة الاستجابة الأخيرة لحساب تأخير الطلب الاحتياطي (p95)"""
+
+    def __init__(self, window_size: int = 200, min_samples: int = 20,
+                 default_delay: float = 1.0, min_delay: float = 0.05):
+        self.samples = deque(maxlen=window_size)
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return self.default_delay
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def hedge_delay(self) -> float:
+        """المدة التي ننتظرها قبل إرسال طلب احتياطي"""
+        return self.percentile(0.95)
@@ -1,6 +1,5 @@
 import os
 import sqlite3
-import shutil
 from datetime import datetime
 
 def backup_before_clean():
@@ -8,7 +7,14 @@ def backup_before_clean():
     if os.path.exists('recipes.db'):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_name = f'recipes_backup_before_clean_{timestamp}.db'
-        shutil.copy2('recipes.db', backup_name)
+        source = sqlite3.connect('recipes.db')
+        destination = sqlite3.connect(backup_name)
+        try:
+            # واجهة backup في SQLite تنسخ ما في ملف WAL أيضاً وتعطي نسخة متسقة حتى أثناء الكتابة من نسخة أخرى
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
         print(f"✅ Backup created before cleaning: {backup_name}")
         return backup_name
     return None
@@ -34,9 +40,11 @@ def recreate_database():
         os.remove('recipes.db')
         print("✅ Old database deleted")
     
-    if os.path.exists('recipes.db-journal'):
-        os.remove('recipes.db-journal')
-        print("✅ Journal file deleted")
+    # ملفات WAL القديمة لا يجب أن تبقى بجانب قاعدة البيانات الجديدة
+    for journal_file in ('recipes.db-journal', 'recipes.db-wal', 'recipes.db-shm'):
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
+            print(f"✅ {journal_file} deleted")
     
     # إنشاء قاعدة بيانات جديدة
     conn = sqlite3.connect('recipes.db')
@@ -70,7 +78,6 @@ def recreate_database():
         user_id INTEGER NOT NULL,
         recipe_id INTEGER NOT NULL,
         recipe_title TEXT NOT NULL,
-        recipe_data TEXT NOT NULL,
         viewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (user_id) REFERENCES users (id)
     )
@@ -82,7 +89,6 @@ def recreate_database():
         user_id INTEGER NOT NULL,
         recipe_id INTEGER NOT NULL,
         recipe_title TEXT NOT NULL,
-        recipe_data TEXT NOT NULL,
         recipe_image TEXT,
         ingredients TEXT,
         saved_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -91,6 +97,52 @@ def recreate_database():
     )
     ''')
     
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS recipes(
+        recipe_id INTEGER PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        recipe_data BLOB NOT NULL,
+        updated_at REAL NOT NULL,
+        image TEXT NOT NULL DEFAULT ''
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS recipe_cache(
+        recipe_id INTEGER PRIMARY KEY,
+        recipe_data BLOB NOT NULL,
+        cached_at REAL NOT NULL,
+        last_accessed REAL NOT NULL
+    )
+    ''')
+    
+    # الفهارس (نفس ترحيلات DatabaseManager) ورقم إصدار المخطط
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_search_history_user_date
+    ON search_history(user_id, search_date DESC, ingredients, results_count)
+    ''')
+    
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_view_history_user_viewed
+    ON view_history(user_id, viewed_at DESC, id DESC)
+    ''')
+    
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_favorites_user_saved
+    ON favorites(user_id, saved_date DESC, id DESC)
+    ''')
+    
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_recipe_cache_accessed
+    ON recipe_cache(last_accessed)
+    ''')
+    
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_view_history_recipe ON view_history(recipe_id)")
+    
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_favorites_recipe ON favorites(recipe_id)")
+    
+    cursor.execute("PRAGMA user_version = 5")
+    
     conn.commit()
     conn.close()
     print("✅ New database created with updated schema")
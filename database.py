@@ -2,26 +2,198 @@ import sqlite3
 import hashlib
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from typing import List, Dict, Optional, Any
+from recipe_model import Recipe
+from payload_codec import PayloadCodec, default_codec
+
+# مهلة انتظار قفل قاعدة البيانات عند الكتابة من أكثر من thread أو نسخة (بالمللي ثانية)
+BUSY_TIMEOUT_MS = 5000
+
+# إعدادات كل اتصال: WAL يسمح بالقراءة أثناء الكتابة، وNORMAL آمن مع WAL وأسرع من FULL
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA temp_store=MEMORY"
+)
+
+def recipe_content_hash(payload):
+    """بصمة محتوى الوصفة لتخطي إعادة الكتابة عندما لا يتغير شيء"""
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def fold_recipe_payloads(connection):
+    """نقل نسخ الوصفات المكررة في التاريخ والمفضلة إلى جدول recipes (نسخة واحدة لكل وصفة)"""
+    upsert = '''
+    INSERT INTO recipes (recipe_id, content_hash, recipe_data, updated_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(recipe_id) DO UPDATE SET
+        content_hash = excluded.content_hash,
+        recipe_data = excluded.recipe_data,
+        updated_at = excluded.updated_at
+    WHERE length(excluded.recipe_data) > length(recipes.recipe_data)
+    '''
+    now = time.time()
+    for table in ('view_history', 'favorites'):
+        columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+        if 'recipe_data' not in columns:
+            continue
+        
+        rows = connection.execute(f"SELECT recipe_id, recipe_data FROM {table}").fetchall()
+        payloads = []
+        for recipe_id, recipe_data in rows:
+            # إعادة الترميز عبر Recipe تحذف البيانات الخام القديمة (full_details والتغذية)
+            try:
+                payload = Recipe.from_json(recipe_data).to_json()
+            except Exception:
+                payload = recipe_data
+            payloads.append((recipe_id, recipe_content_hash(payload), payload, now))
+        # النسخة الأكثر تفصيلاً (الأطول) هي التي تبقى
+        connection.executemany(upsert, payloads)
+        connection.execute(f"ALTER TABLE {table} DROP COLUMN recipe_data")
+
+def compress_recipe_payloads(connection):
+    """ضغط بيانات الوصفات النصية المخزنة سابقاً في recipes وrecipe_cache"""
+    for table in ('recipes', 'recipe_cache'):
+        rows = connection.execute(
+            f"SELECT recipe_id, recipe_data FROM {table} WHERE typeof(recipe_data) = 'text'"
+        ).fetchall()
+        connection.executemany(
+            f"UPDATE {table} SET recipe_data = ? WHERE recipe_id = ?",
+            [(default_codec.encode(recipe_data), recipe_id) for recipe_id, recipe_data in rows]
+        )
+
+def add_recipe_image_column(connection):
+    """إضافة عمود صورة الوصفة إلى recipes حتى تُعرض صفوف القوائم دون فك بيانات الوصفة"""
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(recipes)")}
+    if 'image' not in columns:
+        connection.execute("ALTER TABLE recipes ADD COLUMN image TEXT NOT NULL DEFAULT ''")
+    
+    rows = connection.execute("SELECT recipe_id, recipe_data FROM recipes WHERE image = ''").fetchall()
+    images = []
+    for recipe_id, recipe_data in rows:
+        try:
+            image = Recipe.from_json(default_codec.decode(recipe_data)).image
+        except Exception:
+            continue
+        if image:
+            images.append((image, recipe_id))
+    connection.executemany("UPDATE recipes SET image = ? WHERE recipe_id = ?", images)
+
+# الفهارس بتعريفها الحالي (اسم الفهرس: أمر إنشائه)، تستخدمها الترحيلات وقياس الأداء
+INDEXES = {
+    # فهرس مغطٍّ: تاريخ البحث يُقرأ من الفهرس وحده دون الرجوع للجدول
+    'idx_search_history_user_date': '''CREATE INDEX IF NOT EXISTS idx_search_history_user_date
+           ON search_history(user_id, search_date DESC, ingredients, results_count)''',
+    # id في الفهرس يحسم ترتيب العناصر التي لها نفس الوقت، فتُقرأ الصفحة التالية من الفهرس مباشرة
+    'idx_view_history_user_viewed': '''CREATE INDEX IF NOT EXISTS idx_view_history_user_viewed
+           ON view_history(user_id, viewed_at DESC, id DESC)''',
+    'idx_favorites_user_saved': '''CREATE INDEX IF NOT EXISTS idx_favorites_user_saved
+           ON favorites(user_id, saved_date DESC, id DESC)''',
+    # حذف الأقدم استخداماً من ذاكرة التفاصيل
+    'idx_recipe_cache_accessed': '''CREATE INDEX IF NOT EXISTS idx_recipe_cache_accessed
+           ON recipe_cache(last_accessed)''',
+    # فحص "هل ما زالت الوصفة مستخدمة؟" عند الحذف يقرأ من الفهرس بدل مسح الجدول
+    'idx_view_history_recipe': "CREATE INDEX IF NOT EXISTS idx_view_history_recipe ON view_history(recipe_id)",
+    'idx_favorites_recipe': "CREATE INDEX IF NOT EXISTS idx_favorites_recipe ON favorites(recipe_id)"
+}
+
+# ترحيلات المخطط بالترتيب: (رقم الإصدار، الوصف، الأوامر). الإصدار الحالي محفوظ في PRAGMA user_version
+MIGRATIONS = (
+    (1, "per-user history and favorites indexes", (
+        INDEXES['idx_search_history_user_date'],
+        # التعريف الأول لفهرسي التاريخ والمفضلة (يُستبدل في الترحيل 4)
+        '''CREATE INDEX IF NOT EXISTS idx_view_history_user_viewed
+           ON view_history(user_id, viewed_at DESC)''',
+        '''CREATE INDEX IF NOT EXISTS idx_favorites_user_saved
+           ON favorites(user_id, saved_date DESC)''',
+        INDEXES['idx_recipe_cache_accessed']
+    )),
+    (2, "shared recipes table for history and favorites", (
+        fold_recipe_payloads,
+    )),
+    (3, "compressed recipe payloads", (
+        compress_recipe_payloads,
+    )),
+    (4, "keyset pagination for history and favorites", (
+        add_recipe_image_column,
+        "DROP INDEX IF EXISTS idx_view_history_user_viewed",
+        INDEXES['idx_view_history_user_viewed'],
+        "DROP INDEX IF EXISTS idx_favorites_user_saved",
+        INDEXES['idx_favorites_user_saved']
+    )),
+    (5, "prune recipes no longer referenced by history or favorites", (
+        INDEXES['idx_view_history_recipe'],
+        INDEXES['idx_favorites_recipe'],
+        '''DELETE FROM recipes WHERE recipe_id NOT IN
+           (SELECT recipe_id FROM view_history UNION SELECT recipe_id FROM favorites)'''
+    )),
+)
 
 class DatabaseManager:
-    def __init__(self, db_name='recipes.db'):
+    def __init__(self, db_name='recipes.db', cache_ttl=7 * 24 * 3600, cache_max_entries=500,
+                 codec: Optional[PayloadCodec] = None):
         self.db_name = db_name
-        self.connection = None
-        self.cursor = None
+        # ترميز بيانات الوصفات المخزنة (ضغط zlib أو zstd مع بايت يحدد الطريقة)
+        self.codec = codec if codec is not None else default_codec
+        # اتصال ومؤشر لكل thread، تُعاد استعمالهما طوال عمر الكائن
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        
+        # إعدادات ذاكرة التخزين المؤقت لتفاصيل الوصفات
+        self.cache_ttl = cache_ttl
+        self.cache_max_entries = cache_max_entries
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_lock = threading.Lock()
+        
+    def _open_connection(self):
+        """فتح اتصال جديد بإعدادات WAL"""
+        connection = sqlite3.connect(self.db_name, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            connection.execute(pragma)
+        with self._connections_lock:
+            # إغلاق اتصالات الـ threads المنتهية (مثل threads البحث) حتى لا تتراكم
+            for thread in [thread for thread in self._connections if not thread.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = connection
+        return connection
+        
+    def _thread_state(self):
+        """اتصال ومؤشر الـ thread الحالي (يُفتحان عند أول استخدام)"""
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = self._open_connection()
+            self._local.cursor = self._local.connection.cursor()
+        return self._local
+        
+    @property
+    def connection(self):
+        return self._thread_state().connection
+        
+    @property
+    def cursor(self):
+        return self._thread_state().cursor
         
     def connect(self):
-        """إنشاء اتصال بقاعدة البيانات"""
-        self.connection = sqlite3.connect(self.db_name)
-        self.connection.row_factory = sqlite3.Row
-        self.cursor = self.connection.cursor()
+        """الحصول على اتصال الـ thread الحالي (لا يفتح اتصالاً جديداً إذا كان موجوداً)"""
         return self.connection, self.cursor
         
     def close(self):
-        """إغلاق اتصال قاعدة البيانات"""
-        if self.connection:
-            self.connection.close()
+        """إغلاق كل اتصالات قاعدة البيانات"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, {}
+        for connection in connections.values():
+            try:
+                connection.close()
+            except sqlite3.Error as e:
+                print(f"Error closing connection: {e}")
+        self._local = threading.local()
             
     def create_tables_if_not_exist(self):
         """إنشاء الجداول إذا لم تكن موجودة (بدون حذف القديمة)"""
@@ -55,7 +227,6 @@ class DatabaseManager:
             user_id INTEGER NOT NULL,
             recipe_id INTEGER NOT NULL,
             recipe_title TEXT NOT NULL,
-            recipe_data TEXT NOT NULL,
             viewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
@@ -68,7 +239,6 @@ class DatabaseManager:
             user_id INTEGER NOT NULL,
             recipe_id INTEGER NOT NULL,
             recipe_title TEXT NOT NULL,
-            recipe_data TEXT NOT NULL,
             recipe_image TEXT,
             ingredients TEXT,
             saved_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -77,21 +247,75 @@ class DatabaseManager:
         )
         '''
         
+        # جدول الوصفات: نسخة واحدة لكل وصفة يشير إليها التاريخ والمفضلة
+        create_recipes_table = '''
+        CREATE TABLE IF NOT EXISTS recipes(
+            recipe_id INTEGER PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            recipe_data BLOB NOT NULL,
+            updated_at REAL NOT NULL,
+            image TEXT NOT NULL DEFAULT ''
+        )
+        '''
+        
+        # جدول التخزين المؤقت لتفاصيل الوصفات
+        create_recipe_cache_table = '''
+        CREATE TABLE IF NOT EXISTS recipe_cache(
+            recipe_id INTEGER PRIMARY KEY,
+            recipe_data BLOB NOT NULL,
+            cached_at REAL NOT NULL,
+            last_accessed REAL NOT NULL
+        )
+        '''
+        
         # تنفيذ إنشاء الجداول
         self.cursor.execute(create_users_table)
         self.cursor.execute(create_search_history_table)
         self.cursor.execute(create_view_history_table)
         self.cursor.execute(create_favorites_table)
+        self.cursor.execute(create_recipes_table)
+        self.cursor.execute(create_recipe_cache_table)
         self.connection.commit()
         
+        self.run_migrations()
         print("✅ Tables checked/created without deleting existing data")
         
+    def run_migrations(self):
+        """تطبيق الترحيلات التي لم تُطبَّق بعد (كل ترحيل في معاملة واحدة)"""
+        current_version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        applied = False
+        for version, description, statements in MIGRATIONS:
+            if version <= current_version:
+                continue
+            applied = True
+            try:
+                self.connection.execute("BEGIN IMMEDIATE")
+                for statement in statements:
+                    # الترحيلات التي تحتاج معالجة في Python تُكتب كدوال تأخذ الاتصال
+                    if callable(statement):
+                        statement(self.connection)
+                    else:
+                        self.connection.execute(statement)
+                # PRAGMA لا تقبل معاملات مربوطة
+                self.connection.execute(f"PRAGMA user_version = {int(version)}")
+                self.connection.commit()
+                print(f"✅ Migration {version} applied: {description}")
+            except Exception:
+                self.connection.rollback()
+                raise
+        
+        # إعادة بناء الملف لاسترجاع المساحة التي حررتها الترحيلات (مثل نسخ الوصفات المكررة)
+        if applied:
+            self.connection.execute("VACUUM")
+        
     def initialize_database(self):
         """تهيئة الجداول في قاعدة البيانات (تحذف القديمة) - استخدام بحذر!"""
         # حذف الجداول القديمة أولاً
         self.cursor.execute("DROP TABLE IF EXISTS favorites")
         self.cursor.execute("DROP TABLE IF EXISTS view_history")
         self.cursor.execute("DROP TABLE IF EXISTS search_history")
+        # الفهارس حُذفت مع الجداول، لذا تُعاد الترحيلات من البداية
+        self.cursor.execute("PRAGMA user_version = 0")
         
         # إنشاء الجداول الجديدة
         self.create_tables_if_not_exist()
@@ -162,6 +386,33 @@ class DatabaseManager:
         self.connection.commit()
         return self.cursor.lastrowid
         
+    def write_history_batch(self, searches, views):
+        """حفظ دفعة من أحداث البحث والمشاهدة في معاملة واحدة (من HistoryWriter)"""
+        try:
+            self.cursor.executemany(
+                '''
+                INSERT INTO search_history (user_id, ingredients, results_count, search_date)
+                VALUES (?, ?, ?, ?)
+                ''',
+                searches
+            )
+            # نسخة واحدة لكل وصفة في الدفعة (آخر مشاهدة هي الأحدث)
+            latest_recipes = {recipe_id: recipe_data for _, recipe_id, _, recipe_data, _ in views}
+            for recipe_id, recipe_data in latest_recipes.items():
+                self._store_recipe(recipe_id, recipe_data)
+            self.cursor.executemany(
+                '''
+                INSERT INTO view_history (user_id, recipe_id, recipe_title, viewed_at)
+                VALUES (?, ?, ?, ?)
+                ''',
+                [(user_id, recipe_id, recipe_title, viewed_at)
+                 for user_id, recipe_id, recipe_title, _, viewed_at in views]
+            )
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        
     def get_search_history(self, user_id, limit=10):
         """الحصول على تاريخ البحث"""
         query = '''
@@ -185,39 +436,75 @@ class DatabaseManager:
     def add_to_view_history(self, user_id, recipe_id, recipe_title, recipe_data):
         """إضافة وصفة إلى تاريخ المشاهدة"""
         try:
-            # تحويل recipe_data إلى JSON إذا كان dict
-            if isinstance(recipe_data, dict):
-                recipe_data_json = json.dumps(recipe_data, ensure_ascii=False)
-            else:
-                recipe_data_json = str(recipe_data)
+            self._store_recipe(recipe_id, recipe_data)
             
             query = '''
-            INSERT INTO view_history (user_id, recipe_id, recipe_title, recipe_data)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO view_history (user_id, recipe_id, recipe_title)
+            VALUES (?, ?, ?)
             '''
-            self.cursor.execute(query, (user_id, recipe_id, recipe_title, recipe_data_json))
+            self.cursor.execute(query, (user_id, recipe_id, recipe_title))
             self.connection.commit()
             return self.cursor.lastrowid
         except Exception as e:
+            self.connection.rollback()
             print(f"Error adding to view history: {e}")
             return None
+            
+    def _store_recipe(self, recipe_id, recipe_data):
+        """حفظ نسخة الوصفة المشتركة في جدول recipes (بدون commit)"""
+        payload = self._encode_recipe_data(recipe_data)
+        # الصورة تُحفظ بجانب البيانات المضغوطة لعرض صفوف القوائم دون فكها
+        if isinstance(recipe_data, Recipe):
+            image = recipe_data.image
+        elif isinstance(recipe_data, dict):
+            image = recipe_data.get('image') or ''
+        else:
+            image = ''
+        
+        if isinstance(recipe_data, Recipe) and not recipe_data.has_details:
+            # ملخص نتيجة البحث لا يستبدل نسخة مفصلة محفوظة
+            query = '''
+            INSERT OR IGNORE INTO recipes (recipe_id, content_hash, recipe_data, updated_at, image)
+            VALUES (?, ?, ?, ?, ?)
+            '''
+        else:
+            query = '''
+            INSERT INTO recipes (recipe_id, content_hash, recipe_data, updated_at, image)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(recipe_id) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                recipe_data = excluded.recipe_data,
+                updated_at = excluded.updated_at,
+                image = excluded.image
+            WHERE recipes.content_hash != excluded.content_hash
+            '''
+        self.cursor.execute(query, (recipe_id, recipe_content_hash(payload), self.codec.encode(payload), time.time(), image))
+        
+    def _encode_recipe_data(self, recipe_data):
+        """ترميز بيانات الوصفة كنص JSON للتخزين"""
+        if isinstance(recipe_data, Recipe):
+            return recipe_data.to_json()
+        if isinstance(recipe_data, dict):
+            return json.dumps(recipe_data, ensure_ascii=False)
+        return str(recipe_data)
         
-    def get_view_history(self, user_id, limit=20):
-        """الحصول على تاريخ المشاهدة"""
+    def get_view_history(self, user_id, limit=20, offset=0):
+        """الحصول على تاريخ المشاهدة (صفحة واحدة)"""
         query = '''
-        SELECT recipe_id, recipe_title, recipe_data, viewed_at
-        FROM view_history
-        WHERE user_id = ?
-        ORDER BY viewed_at DESC
-        LIMIT ?
+        SELECT v.recipe_id, v.recipe_title, r.recipe_data, v.viewed_at
+        FROM view_history v
+        LEFT JOIN recipes r ON r.recipe_id = v.recipe_id
+        WHERE v.user_id = ?
+        ORDER BY v.viewed_at DESC
+        LIMIT ? OFFSET ?
         '''
-        self.cursor.execute(query, (user_id, limit))
+        self.cursor.execute(query, (user_id, limit, offset))
         rows = self.cursor.fetchall()
         
         history = []
         for row in rows:
             try:
-                recipe_data = json.loads(row['recipe_data'])
+                recipe_data = Recipe.from_json(self.codec.decode(row['recipe_data']))
                 history.append({
                     'recipe_id': row['recipe_id'],
                     'recipe_title': row['recipe_title'],
@@ -229,57 +516,99 @@ class DatabaseManager:
                 history.append({
                     'recipe_id': row['recipe_id'],
                     'recipe_title': row['recipe_title'],
-                    'recipe_data': {},
+                    'recipe_data': Recipe(id=row['recipe_id'], title=row['recipe_title']),
                     'viewed_at': row['viewed_at']
                 })
         
         return history
         
+    def get_view_history_page(self, user_id, limit=50, after=None, offset=0):
+        """صفحة خفيفة من تاريخ المشاهدة (بدون فك بيانات الوصفات)
+        
+        after هو cursor آخر صف في الصفحة السابقة؛ بدونه تُستخدم offset (للقفز إلى موضع بعيد)
+        """
+        query = '''
+        SELECT v.id, v.recipe_id, v.recipe_title, COALESCE(r.image, '') AS recipe_image, v.viewed_at
+        FROM view_history v
+        LEFT JOIN recipes r ON r.recipe_id = v.recipe_id
+        WHERE v.user_id = ?
+        '''
+        params = [user_id]
+        if after is not None:
+            # مقارنة row value تبدأ القراءة من موضع cursor في الفهرس مباشرة
+            query += " AND (v.viewed_at, v.id) < (?, ?)"
+            params += list(after)
+            offset = 0
+        query += " ORDER BY v.viewed_at DESC, v.id DESC LIMIT ? OFFSET ?"
+        self.cursor.execute(query, (*params, limit, offset))
+        
+        return [{
+            'id': row['id'],
+            'recipe_id': row['recipe_id'],
+            'recipe_title': row['recipe_title'],
+            'recipe_image': row['recipe_image'],
+            'viewed_at': row['viewed_at'],
+            'cursor': (row['viewed_at'], row['id'])
+        } for row in self.cursor.fetchall()]
+    
+    def get_view_history_count(self, user_id):
+        """الحصول على عدد عناصر تاريخ المشاهدة للمستخدم"""
+        query = "SELECT COUNT(*) FROM view_history WHERE user_id = ?"
+        self.cursor.execute(query, (user_id,))
+        result = self.cursor.fetchone()
+        return result[0] if result else 0
+        
     def clear_view_history(self, user_id):
         """مسح تاريخ المشاهدة"""
+        self.cursor.execute("SELECT DISTINCT recipe_id FROM view_history WHERE user_id = ?", (user_id,))
+        recipe_ids = [row[0] for row in self.cursor.fetchall()]
+        
         query = "DELETE FROM view_history WHERE user_id = ?"
         self.cursor.execute(query, (user_id,))
+        deleted = self.cursor.rowcount
+        self._prune_recipes(recipe_ids)
         self.connection.commit()
-        return self.cursor.rowcount
+        return deleted
         
     def add_to_favorites(self, user_id, recipe_id, recipe_title, recipe_data, recipe_image="", ingredients=""):
         """إضافة وصفة إلى المفضلة"""
         try:
-            # تحويل recipe_data إلى JSON
-            if isinstance(recipe_data, dict):
-                recipe_data_json = json.dumps(recipe_data, ensure_ascii=False)
-            else:
-                recipe_data_json = str(recipe_data)
+            self._store_recipe(recipe_id, recipe_data)
             
             query = '''
-            INSERT INTO favorites (user_id, recipe_id, recipe_title, recipe_data, recipe_image, ingredients)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT INTO favorites (user_id, recipe_id, recipe_title, recipe_image, ingredients)
+            VALUES (?, ?, ?, ?, ?)
             '''
-            self.cursor.execute(query, (user_id, recipe_id, recipe_title, recipe_data_json, recipe_image, ingredients))
+            self.cursor.execute(query, (user_id, recipe_id, recipe_title, recipe_image, ingredients))
             self.connection.commit()
             return True
         except sqlite3.IntegrityError:
             # موجودة بالفعل
+            self.connection.rollback()
             return False
         except Exception as e:
+            self.connection.rollback()
             print(f"Error adding to favorites: {e}")
             return False
             
-    def get_favorites(self, user_id):
-        """الحصول على الوصفات المفضلة"""
+    def get_favorites(self, user_id, limit=None, offset=0):
+        """الحصول على الوصفات المفضلة (كلها أو صفحة واحدة)"""
         query = '''
-        SELECT recipe_id, recipe_title, recipe_data, recipe_image, ingredients, saved_date
-        FROM favorites
-        WHERE user_id = ?
-        ORDER BY saved_date DESC
+        SELECT f.recipe_id, f.recipe_title, r.recipe_data, f.recipe_image, f.ingredients, f.saved_date
+        FROM favorites f
+        LEFT JOIN recipes r ON r.recipe_id = f.recipe_id
+        WHERE f.user_id = ?
+        ORDER BY f.saved_date DESC
+        LIMIT ? OFFSET ?
         '''
-        self.cursor.execute(query, (user_id,))
+        # LIMIT -1 في SQLite تعني بدون حد
+        self.cursor.execute(query, (user_id, -1 if limit is None else limit, offset))
         rows = self.cursor.fetchall()
         
         favorites = []
         for row in rows:
             try:
-                recipe_data = json.loads(row['recipe_data'])
+                recipe_data = Recipe.from_json(self.codec.decode(row['recipe_data']))
                 favorites.append({
                     'recipe_id': row['recipe_id'],
                     'recipe_title': row['recipe_title'],
@@ -293,7 +622,7 @@ class DatabaseManager:
                 favorites.append({
                     'recipe_id': row['recipe_id'],
                     'recipe_title': row['recipe_title'],
-                    'recipe_data': {},
+                    'recipe_data': Recipe(id=row['recipe_id'], title=row['recipe_title']),
                     'recipe_image': row['recipe_image'],
                     'ingredients': row['ingredients'],
                     'saved_date': row['saved_date']
@@ -301,12 +630,67 @@ class DatabaseManager:
         
         return favorites
         
+    def get_favorites_page(self, user_id, limit=50, after=None, offset=0):
+        """صفحة خفيفة من المفضلة (بدون فك بيانات الوصفات)
+        
+        after هو cursor آخر صف في الصفحة السابقة؛ بدونه تُستخدم offset (للقفز إلى موضع بعيد)
+        """
+        query = '''
+        SELECT f.id, f.recipe_id, f.recipe_title,
+               COALESCE(NULLIF(f.recipe_image, ''), r.image, '') AS recipe_image,
+               f.ingredients, f.saved_date
+        FROM favorites f
+        LEFT JOIN recipes r ON r.recipe_id = f.recipe_id
+        WHERE f.user_id = ?
+        '''
+        params = [user_id]
+        if after is not None:
+            query += " AND (f.saved_date, f.id) < (?, ?)"
+            params += list(after)
+            offset = 0
+        query += " ORDER BY f.saved_date DESC, f.id DESC LIMIT ? OFFSET ?"
+        self.cursor.execute(query, (*params, limit, offset))
+        
+        return [{
+            'id': row['id'],
+            'recipe_id': row['recipe_id'],
+            'recipe_title': row['recipe_title'],
+            'recipe_image': row['recipe_image'],
+            'ingredients': row['ingredients'],
+            'saved_date': row['saved_date'],
+            'cursor': (row['saved_date'], row['id'])
+        } for row in self.cursor.fetchall()]
+    
+    def get_recipe(self, recipe_id, recipe_title=''):
+        """فك بيانات وصفة واحدة محفوظة (عند فتحها من التاريخ أو المفضلة)"""
+        self.cursor.execute("SELECT recipe_data FROM recipes WHERE recipe_id = ?", (recipe_id,))
+        row = self.cursor.fetchone()
+        if row is not None:
+            try:
+                return Recipe.from_json(self.codec.decode(row['recipe_data']))
+            except Exception as e:
+                print(f"Error parsing recipe data: {e}")
+        return Recipe(id=recipe_id, title=recipe_title)
+    
     def remove_from_favorites(self, user_id, recipe_id):
         """إزالة وصفة من المفضلة"""
         query = "DELETE FROM favorites WHERE user_id = ? AND recipe_id = ?"
         self.cursor.execute(query, (user_id, recipe_id))
+        removed = self.cursor.rowcount > 0
+        if removed:
+            self._prune_recipes([recipe_id])
         self.connection.commit()
-        return self.cursor.rowcount > 0
+        return removed
+        
+    def _prune_recipes(self, recipe_ids):
+        """حذف نسخ الوصفات التي لم يعد يشير إليها تاريخ أو مفضلة (بدون commit)"""
+        query = '''
+        DELETE FROM recipes
+        WHERE recipe_id = ?
+          AND NOT EXISTS (SELECT 1 FROM view_history WHERE recipe_id = recipes.recipe_id)
+          AND NOT EXISTS (SELECT 1 FROM favorites WHERE recipe_id = recipes.recipe_id)
+        '''
+        self.cursor.executemany(query, [(recipe_id,) for recipe_id in recipe_ids])
         
     def is_favorite(self, user_id, recipe_id):
         """التحقق إذا كانت الوصفة مفضلة"""
@@ -320,3 +704,93 @@ class DatabaseManager:
         self.cursor.execute(query, (user_id,))
         result = self.cursor.fetchone()
         return result[0] if result else 0
+        
+    def _record_cache_lookup(self, hits, misses):
+        """تحديث عدادات الإصابة والإخفاق"""
+        with self._cache_lock:
+            self.cache_hits += hits
+            self.cache_misses += misses
+        
+    def get_cached_recipes(self, recipe_ids, allow_stale=False):
+        """الحصول على تفاصيل الوصفات المخزنة مؤقتاً (غير المنتهية الصلاحية إلا عند allow_stale)"""
+        if not recipe_ids:
+            return {}
+        
+        connection = self.connection
+        placeholders = ",".join("?" * len(recipe_ids))
+        query = f'''
+        SELECT recipe_id, recipe_data
+        FROM recipe_cache
+        WHERE recipe_id IN ({placeholders}) AND cached_at > ?
+        '''
+        now = time.time()
+        cutoff = 0 if allow_stale else now - self.cache_ttl
+        rows = connection.execute(query, (*recipe_ids, cutoff)).fetchall()
+        
+        cached = {}
+        for row in rows:
+            try:
+                cached[row['recipe_id']] = Recipe.from_json(self.codec.decode(row['recipe_data']))
+            except Exception as e:
+                print(f"Error parsing cached recipe {row['recipe_id']}: {e}")
+        
+        # تحديث وقت آخر استخدام لسياسة LRU
+        if cached:
+            connection.executemany(
+                "UPDATE recipe_cache SET last_accessed = ? WHERE recipe_id = ?",
+                [(now, recipe_id) for recipe_id in cached]
+            )
+            connection.commit()
+        
+        self._record_cache_lookup(len(cached), len(set(recipe_ids)) - len(cached))
+        return cached
+        
+    def get_cached_recipe(self, recipe_id):
+        """الحصول على تفاصيل وصفة واحدة من التخزين المؤقت"""
+        return self.get_cached_recipes([recipe_id]).get(recipe_id)
+        
+    def cache_recipes(self, recipes):
+        """تخزين تفاصيل الوصفات مؤقتاً مع حذف الأقدم استخداماً عند تجاوز الحد"""
+        rows = [(recipe.id, self.codec.encode(recipe.to_json())) for recipe in recipes if recipe.id]
+        if not rows:
+            return
+        
+        connection = self.connection
+        now = time.time()
+        try:
+            connection.executemany(
+                '''
+                INSERT OR REPLACE INTO recipe_cache (recipe_id, recipe_data, cached_at, last_accessed)
+                VALUES (?, ?, ?, ?)
+                ''',
+                [(recipe_id, recipe_data, now, now) for recipe_id, recipe_data in rows]
+            )
+            connection.execute(
+                '''
+                DELETE FROM recipe_cache WHERE recipe_id IN (
+                    SELECT recipe_id FROM recipe_cache
+                    ORDER BY last_accessed DESC
+                    LIMIT -1 OFFSET ?
+                )
+                ''',
+                (self.cache_max_entries,)
+            )
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            print(f"Error caching recipes: {e}")
+        
+    def cache_recipe(self, recipe):
+        """تخزين تفاصيل وصفة واحدة مؤقتاً"""
+        self.cache_recipes([recipe])
+        
+    def get_cache_stats(self):
+        """إحصائيات التخزين المؤقت"""
+        with self._cache_lock:
+            hits, misses = self.cache_hits, self.cache_misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0
+        }
@@ -0,0 +1,100 @@
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from recipe_model import Recipe
+
+class HistoryWriter:
+    """كتابة مؤجلة لتاريخ البحث والمشاهدة: thread واحد يجمع الأحداث ويحفظها بـ commit واحد لكل دفعة"""
+
+    def __init__(self, db_manager, max_batch: int = 200, flush_interval: float = 0.5, max_pending: int = 1000,
+                 max_retries: int = 5, retry_delay: float = 0.5):
+        self.db_manager = db_manager
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        # إعادة محاولة الدفعة عند انشغال قاعدة البيانات (database is locked) قبل التخلي عنها
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # طابور محدود: عند امتلائه ينتظر المستدعي بدلاً من تراكم الذاكرة
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _timestamp(self):
+        # نفس صيغة CURRENT_TIMESTAMP في SQLite (UTC) حتى يبقى الترتيب حسب وقت الحدث لا وقت الكتابة
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def log_search(self, user_id, ingredients, results_count):
+        """تسجيل بحث (يعود فوراً)"""
+        self._queue.put(('search', (user_id, ingredients, results_count, self._timestamp())))
+
+    def log_view(self, user_id, recipe_id, recipe_title, recipe_data):
+        """تسجيل مشاهدة وصفة (يعود فوراً)"""
+        # نسخة مستقلة عبر JSON: الواجهة تستمر في دمج التفاصيل في نفس الكائن أثناء انتظار الكتابة
+        if isinstance(recipe_data, Recipe):
+            recipe_data = Recipe.from_json(recipe_data.to_json())
+        self._queue.put(('view', (user_id, recipe_id, recipe_title, recipe_data, self._timestamp())))
+
+    def flush(self):
+        """الانتظار حتى تُحفظ كل الأحداث المنتظرة (دون انتظار مهلة التجميع)"""
+        self._queue.put(('flush', None))
+        self._queue.join()
+
+    def close(self):
+        """حفظ ما تبقى وإيقاف thread الكتابة"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            stop = False
+            # تجميع الأحداث حتى حجم الدفعة أو انتهاء مهلة التجميع أو طلب flush
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch and batch[-1][0] != 'flush':
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        searches = [event for kind, event in batch if kind == 'search']
+        views = [event for kind, event in batch if kind == 'view']
+        if not searches and not views:
+            return
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.db_manager.write_history_batch(searches, views)
+                return
+            except sqlite3.OperationalError as e:
+                if attempt == self.max_retries:
+                    print(f"Error writing history batch ({len(batch)} events), giving up: {e}")
+                    return
+                print(f"History batch not written ({e}), retrying")
+                time.sleep(self.retry_delay * (2 ** attempt))
+            except Exception as e:
+                print(f"Error writing history batch ({len(batch)} events): {e}")
+                return
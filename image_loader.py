@@ -0,0 +1,80 @@
+import itertools
+import queue
+import threading
+
+class ImageJob:
+    """مهمة تحميل صورة واحدة في طابور العمال"""
+    __slots__ = ('key', 'priority', 'func', 'args', 'on_done', 'cancelled', 'running')
+
+    def __init__(self, key, priority, func, args, on_done):
+        self.key = key
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.cancelled = False
+        self.running = False
+
+class ImageWorkerPool:
+    """عدد ثابت من العمال يأخذون المهام حسب الأولوية (الأصغر أولاً)"""
+
+    def __init__(self, workers: int = 4):
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        for _ in range(max(1, workers)):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key, func, args=(), priority: int = 0, on_done=None):
+        """إضافة مهمة؛ إعادة إرسال نفس المفتاح بأولوية أعلى تنقلها للأمام"""
+        with self._lock:
+            existing = self._pending.get(key)
+            if existing is not None:
+                if existing.running or existing.priority <= priority:
+                    return
+                existing.cancelled = True
+
+            job = ImageJob(key, priority, func, args, on_done)
+            self._pending[key] = job
+        self._queue.put((priority, next(self._sequence), job))
+
+    def cancel_all(self):
+        """إلغاء كل المهام المنتظرة، وتجاهل نتائج المهام قيد التنفيذ (عند بحث جديد)"""
+        with self._lock:
+            for job in self._pending.values():
+                job.cancelled = True
+            self._pending.clear()
+
+    def shutdown(self):
+        """إيقاف العمال بعد إلغاء المهام المتبقية"""
+        self.cancel_all()
+        for _ in self._threads:
+            self._queue.put((float('inf'), next(self._sequence), None))
+
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+
+            with self._lock:
+                if job.cancelled:
+                    continue
+                job.running = True
+
+            try:
+                result = job.func(*job.args)
+            except Exception as e:
+                print(f"Image job {job.key} failed: {e}")
+                result = None
+
+            with self._lock:
+                if self._pending.get(job.key) is job:
+                    del self._pending[job.key]
+                deliver = not job.cancelled
+            if deliver and job.on_done is not None:
+                job.on_done(result)
@@ -7,7 +7,11 @@ class LoginWindow:
     def __init__(self, root):
         self.root = root
         self.db_manager = DatabaseManager()
+        # اتصال واحد لكل thread يُعاد استعماله في كل عمليات الدخول والتسجيل
+        self.db_manager.connect()
+        self.db_manager.create_tables_if_not_exist()
         self.current_user = None  # تخزين معلومات المستخدم الحالي
+        self.recipe_app = None
         self.setup_window()
         self.create_widgets()
         
@@ -177,14 +181,14 @@ class LoginWindow:
             return
             
         try:
-            connection, cursor = self.db_manager.connect()
-            
-            # ✅✅✅ التعديل المهم: استخدم create_tables_if_not_exist بدلاً من initialize_database
-            self.db_manager.create_tables_if_not_exist()
-            
             # التحقق من صحة API Key
             api_handler = RecipeAPIHandler(api_key)
-            if not api_handler.validate_api_key():
+            try:
+                key_is_valid = api_handler.validate_api_key()
+            finally:
+                # الجلسة ومنفذ الطلبات الاحتياطية لا يُحتاج إليهما بعد التحقق
+                api_handler.close()
+            if not key_is_valid:
                 messagebox.showwarning("API Error", "Invalid API key! Please check your key.")
                 return
                 
@@ -213,11 +217,6 @@ class LoginWindow:
             return
             
         try:
-            connection, cursor = self.db_manager.connect()
-            
-            # ✅✅✅ التعديل المهم: استخدم create_tables_if_not_exist بدلاً من initialize_database
-            self.db_manager.create_tables_if_not_exist()
-            
             # التحقق من بيانات الدخول
             user_data = self.db_manager.authenticate_user(username, password)
             
@@ -259,9 +258,12 @@ class LoginWindow:
         app_window = Toplevel(self.root)
         app_window.protocol("WM_DELETE_WINDOW", lambda: self.on_app_close(app_window))
         
-        RecipeApp(app_window, self.root, self.current_user, self.db_manager)
+        self.recipe_app = RecipeApp(app_window, self.root, self.current_user, self.db_manager)
         
     def on_app_close(self, app_window):
         """معالجة إغلاق نافذة التطبيق"""
+        if self.recipe_app is not None:
+            self.recipe_app.close_resources()
+            self.recipe_app = None
         app_window.destroy()
         self.root.deiconify()
@@ -1,7 +1,7 @@
 from tkinter import Tk
 from login_window import LoginWindow
 import os
-import shutil
+import sqlite3
 from datetime import datetime
 
 def backup_database():
@@ -10,7 +10,14 @@ def backup_database():
         if os.path.exists('recipes.db'):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f'recipes_backup_{timestamp}.db'
-            shutil.copy2('recipes.db', backup_name)
+            source = sqlite3.connect('recipes.db')
+            destination = sqlite3.connect(backup_name)
+            try:
+                # واجهة backup في SQLite تنسخ ما في ملف WAL أيضاً وتعطي نسخة متسقة حتى أثناء الكتابة من نسخة أخرى
+                source.backup(destination)
+            finally:
+                destination.close()
+                source.close()
             print(f"✅ Database backed up as: {backup_name}")
             
             # حذف النسخ القديمة (احتفظ بـ5 نسخ فقط)
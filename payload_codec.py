@@ -0,0 +1,129 @@
+import os
+import zlib
+from typing import Iterable, Optional, Union
+
+# zstandard اختياري: بدونه تُضغط البيانات بـ zlib فقط
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# البايت الأول من كل قيمة مخزنة يحدد طريقة الترميز
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_ZSTD_DICT = 3
+
+# zstandard ليس ضمن requirements.txt: الضغط به اختياري ويُفعَّل صراحةً، وإلا تبقى القيم الجديدة بـ zlib
+PREFER_ZSTD = False
+
+# ملفات القواميس بجانب ملفات التطبيق (لا تتبع مجلد التشغيل الحالي)
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# قاموس zstd مدرَّب على بيانات الوصفات (يُستخدم للضغط إذا وُجد الملف)
+ZSTD_DICTIONARY_PATH = os.path.join(APP_DIR, 'recipe_payloads.zdict')
+# نسخة من كل قاموس دُرِّب باسم dict_id الخاص به: القيم القديمة تبقى قابلة للفك بعد تدريب قاموس جديد
+ZSTD_DICTIONARY_ARCHIVE = os.path.join(APP_DIR, 'recipe_dictionaries')
+
+def load_dictionaries(archive_dir: str = ZSTD_DICTIONARY_ARCHIVE) -> dict:
+    """تحميل كل القواميس المحفوظة حسب dict_id"""
+    dictionaries = {}
+    if zstandard is None or not archive_dir or not os.path.isdir(archive_dir):
+        return dictionaries
+    for name in os.listdir(archive_dir):
+        if name.endswith('.zdict'):
+            with open(os.path.join(archive_dir, name), 'rb') as dictionary_file:
+                dictionary = zstandard.ZstdCompressionDict(dictionary_file.read())
+            dictionaries[dictionary.dict_id()] = dictionary
+    return dictionaries
+
+class PayloadCodec:
+    """ترميز نصوص JSON المخزنة كقيم مضغوطة مع بايت يحدد طريقة الضغط"""
+
+    def __init__(self, prefer_zstd: bool = PREFER_ZSTD, dictionary_path: Optional[str] = ZSTD_DICTIONARY_PATH,
+                 zlib_level: int = 6, zstd_level: int = 9,
+                 archive_dir: Optional[str] = ZSTD_DICTIONARY_ARCHIVE):
+        self.zlib_level = zlib_level
+        self.use_zstd = prefer_zstd and zstandard is not None
+        self._zstd_level = zstd_level
+        self.archive_dir = archive_dir
+        # القاموس الحالي للضغط، وكل القواميس المعروفة للفك (تُحمَّل حتى لو كان الضغط بـ zlib)
+        self._dictionary = None
+        self._dictionaries = load_dictionaries(archive_dir)
+        if zstandard is not None and dictionary_path and os.path.exists(dictionary_path):
+            with open(dictionary_path, 'rb') as dictionary_file:
+                dictionary = zstandard.ZstdCompressionDict(dictionary_file.read())
+            self._dictionaries[dictionary.dict_id()] = dictionary
+            if self.use_zstd:
+                self._dictionary = dictionary
+
+    def encode(self, text: str) -> bytes:
+        """ضغط النص؛ القيم الصغيرة التي لا يفيدها الضغط تُحفظ كما هي"""
+        raw = text.encode('utf-8')
+        if self.use_zstd:
+            # ZstdCompressor ليس آمناً للاستخدام من عدة threads، لذا يُنشأ لكل استدعاء
+            if self._dictionary is not None:
+                codec = CODEC_ZSTD_DICT
+                # dict_id يُكتب في رأس الإطار ليُعرف القاموس المطلوب عند الفك
+                compressor = zstandard.ZstdCompressor(level=self._zstd_level, dict_data=self._dictionary,
+                                                      write_dict_id=True)
+            else:
+                codec = CODEC_ZSTD
+                compressor = zstandard.ZstdCompressor(level=self._zstd_level)
+            compressed = compressor.compress(raw)
+        else:
+            codec = CODEC_ZLIB
+            compressed = zlib.compress(raw, self.zlib_level)
+
+        if len(compressed) >= len(raw):
+            return bytes([CODEC_RAW]) + raw
+        return bytes([codec]) + compressed
+
+    def decode(self, value: Union[str, bytes]) -> str:
+        """فك الترميز حسب البايت الأول (النصوص القديمة غير المضغوطة تُعاد كما هي)"""
+        if isinstance(value, str):
+            return value
+        codec, data = value[0], value[1:]
+        if codec == CODEC_RAW:
+            raw = data
+        elif codec == CODEC_ZLIB:
+            raw = zlib.decompress(data)
+        elif codec in (CODEC_ZSTD, CODEC_ZSTD_DICT):
+            if zstandard is None:
+                raise ValueError("zstandard is required to decode this payload")
+            if codec == CODEC_ZSTD_DICT:
+                dict_id = zstandard.get_frame_parameters(data).dict_id
+                dictionary = self._dictionaries.get(dict_id)
+                if dictionary is None:
+                    raise ValueError(f"zstd dictionary {dict_id} is missing from {self.archive_dir}/")
+                decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            else:
+                decompressor = zstandard.ZstdDecompressor()
+            raw = decompressor.decompress(data)
+        else:
+            raise ValueError(f"Unknown payload codec: {codec}")
+        return bytes(raw).decode('utf-8')
+
+def train_dictionary(samples: Iterable[str], path: str = ZSTD_DICTIONARY_PATH, size: int = 16 * 1024,
+                     archive_dir: str = ZSTD_DICTIONARY_ARCHIVE) -> bool:
+    """تدريب قاموس zstd على عينات من بيانات الوصفات وحفظه (يتطلب zstandard)"""
+    if zstandard is None:
+        print("zstandard is not installed, skipping dictionary training")
+        return False
+    # القاموس الحالي قد تعتمد عليه قيم مخزنة: لاستبداله يُحذف الملف يدوياً (نسخته تبقى في الأرشيف)
+    if os.path.exists(path):
+        print(f"{path} already exists, refusing to overwrite it")
+        return False
+    dictionary = zstandard.train_dictionary(size, [sample.encode('utf-8') for sample in samples])
+    data = dictionary.as_bytes()
+
+    os.makedirs(archive_dir, exist_ok=True)
+    archive_path = os.path.join(archive_dir, f"{dictionary.dict_id()}.zdict")
+    if not os.path.exists(archive_path):
+        with open(archive_path, 'xb') as dictionary_file:
+            dictionary_file.write(data)
+    with open(path, 'xb') as dictionary_file:
+        dictionary_file.write(data)
+    return True
+
+# الترميز الافتراضي المشترك (قاعدة البيانات والترحيلات)
+default_codec = PayloadCodec()
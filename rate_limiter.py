@@ -0,0 +1,138 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from circuit_breaker import CircuitOpenError
+
+# تكلفة كل نقطة نهاية بنقاط Spoonacular: (تكلفة ثابتة، تكلفة لكل نتيجة/وصفة إضافية)
+ENDPOINT_POINT_COSTS = {
+    'findByIngredients': (1.0, 0.01),
+    'complexSearch': (1.0, 0.01),
+    'informationBulk': (1.0, 0.5),
+    'information': (1.0, 0.0)
+}
+
+def estimate_points(url: str, params: Optional[Dict] = None) -> float:
+    """تقدير عدد النقاط التي سيستهلكها الطلب"""
+    params = params or {}
+    endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+    base_cost, per_item = ENDPOINT_POINT_COSTS.get(endpoint, (1.0, 0.0))
+
+    if endpoint == 'informationBulk':
+        extra_items = max(0, len(str(params.get('ids', '')).split(',')) - 1)
+    else:
+        extra_items = int(params.get('number', 0) or 0)
+
+    return base_cost + per_item * extra_items
+
+class QuotaExhaustedError(CircuitOpenError):
+    """حصة النقاط اليومية لا تكفي للطلب: يُرفض دون إرساله حتى تتجدد الحصة"""
+    pass
+
+def quota_day() -> str:
+    """اليوم الحالي بتوقيت UTC (حصة Spoonacular تتجدد عند منتصف الليل UTC)"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+class TokenBucket:
+    """دلو رموز: يسمح بدفعات قصيرة ثم يحافظ على معدل ثابت"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, cost: float = 1.0):
+        """الانتظار حتى تتوفر رموز كافية ثم استهلاكها (تنعيم بدل الفشل)"""
+        cost = min(cost, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait_time = (cost - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+    def drain(self):
+        """تفريغ الدلو (بعد رد 429 من الخادم)"""
+        with self._lock:
+            self._refill()
+            self.tokens = 0
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+class QuotaRateLimiter:
+    """محدد معدل لكل مفتاح API مع تتبع حصة النقاط من ترويسات الاستجابة"""
+
+    def __init__(self, points_per_second: float = 1.0, burst: float = 5.0):
+        self.bucket = TokenBucket(points_per_second, burst)
+        self.quota_used = None
+        self.quota_left = None
+        self.last_request_cost = None
+        # يوم آخر قراءة للحصة: قيمة quota_left من يوم سابق لا تمنع الطلبات بعد تجدد الحصة
+        self.quota_day = None
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str, params: Optional[Dict] = None):
+        """حجز النقاط المقدّرة للطلب قبل إرساله (QuotaExhaustedError إذا كانت الحصة المتبقية لا تكفي)"""
+        cost = estimate_points(url, params)
+        with self._lock:
+            if self.quota_left is not None and self.quota_day == quota_day() and self.quota_left <= cost:
+                raise QuotaExhaustedError(
+                    f"Daily API quota exhausted ({self.quota_left:.1f} points left), skipped {url}"
+                )
+        self.bucket.acquire(cost)
+
+    def record_response(self, status_code: int, headers):
+        """قراءة ترويسات الحصة من استجابة Spoonacular"""
+        with self._lock:
+            self.quota_used = self._parse_float(headers.get('X-API-Quota-Used'), self.quota_used)
+            self.quota_left = self._parse_float(headers.get('X-API-Quota-Left'), self.quota_left)
+            self.last_request_cost = self._parse_float(headers.get('X-API-Quota-Request'), self.last_request_cost)
+            # 402: انتهت الحصة اليومية، فلا نرسل شيئاً آخر حتى اليوم التالي
+            if status_code == 402:
+                self.quota_left = 0.0
+            if self.quota_left is not None:
+                self.quota_day = quota_day()
+
+        if status_code == 429:
+            self.bucket.drain()
+
+    def _parse_float(self, value, default):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+
+    def get_status(self) -> Dict:
+        """حالة الحصة الحالية (للعرض في شريط الحالة)"""
+        with self._lock:
+            return {
+                'quota_used': self.quota_used,
+                'quota_left': self.quota_left,
+                'last_request_cost': self.last_request_cost,
+                'tokens_available': self.bucket.available()
+            }
+
+# محدد واحد لكل مفتاح API مشترك بين كل الكائنات التي تستخدم نفس المفتاح
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(api_key: str) -> QuotaRateLimiter:
+    """الحصول على محدد المعدل الخاص بمفتاح API"""
+    with _limiters_lock:
+        limiter = _limiters.get(api_key)
+        if limiter is None:
+            limiter = QuotaRateLimiter()
+            _limiters[api_key] = limiter
+        return limiter
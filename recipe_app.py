@@ -1,25 +1,59 @@
 from tkinter import *
 from tkinter import messagebox, scrolledtext
 from tkinter import ttk
+from PIL import ImageTk
 from api_handler import RecipeAPIHandler
+from async_api_handler import AsyncRecipeAPIHandler, AsyncLoopBridge
+from image_loader import ImageWorkerPool
+from virtual_list import VirtualList
+from history_writer import HistoryWriter
 from database import DatabaseManager
-import threading
-import json
+import queue
 from datetime import datetime
 
+# الفاصل الزمني (ms) بين دفعات عرض النتائج وعدد البطاقات في كل دفعة
+RENDER_INTERVAL_MS = 50
+RENDER_BATCH_SIZE = 5
+# مدة انتظار توقف التمرير (ms) قبل التحميل المسبق للبطاقات الظاهرة
+PREFETCH_SCROLL_DELAY_MS = 300
+# الفاصل الزمني (ms) لتحديث عرض حصة API
+QUOTA_REFRESH_MS = 2000
+# عدد عمال تحميل الصور (ثابت مهما كثرت البطاقات أو عمليات البحث)
+IMAGE_WORKERS = 4
+# عمال مصغّرات قوائم التاريخ والمفضلة (مجمع منفصل لا يلغيه بحث جديد)
+LIST_IMAGE_WORKERS = 2
+# ارتفاع الصف وحجم المصغّرة في قوائم التاريخ والمفضلة
+LIST_ROW_HEIGHT = 100
+LIST_THUMBNAIL_SIZE = (60, 60)
+# أحداث عجلة الفأرة: MouseWheel في Windows وmacOS، وButton-4/5 في Linux
+WHEEL_SEQUENCES = ('<MouseWheel>', '<Button-4>', '<Button-5>')
+
 class RecipeApp:
     def __init__(self, window, login_window, user_data, db_manager):
         self.window = window
         self.login_window = login_window
         self.user_data = user_data
         self.db_manager = db_manager
-        self.api_handler = RecipeAPIHandler(user_data["api_key"])
+        self.api_handler = RecipeAPIHandler(user_data["api_key"], detail_cache=db_manager)
+        # حلقة asyncio واحدة لطلبات التفاصيل بدلاً من thread لكل طلب
+        self.async_api_handler = AsyncRecipeAPIHandler(user_data["api_key"], handler=self.api_handler)
+        self.async_bridge = AsyncLoopBridge(window)
+        self.image_pool = ImageWorkerPool(IMAGE_WORKERS)
+        self.list_image_pool = ImageWorkerPool(LIST_IMAGE_WORKERS)
+        # تاريخ البحث والمشاهدة يُكتب في الخلفية على دفعات حتى لا تنتظر الواجهة القرص
+        self.history_writer = HistoryWriter(db_manager)
         
         self.setup_window()
         self.create_widgets()
         self.recipes = []
         self.current_images = []
-        self.image_cache = {}
+        # رقم البحث الحالي لتجاهل نتائج عمليات البحث القديمة
+        self.search_generation = 0
+        self.search_future = None
+        # التفاصيل الكاملة المحمّلة عند الطلب أو مسبقاً (حسب معرف الوصفة)
+        self.recipe_details = {}
+        self.prefetching = set()
+        self.prefetch_job = None
         
     def setup_window(self):
         """إعداد نافذة التطبيق"""
@@ -238,7 +272,8 @@ class RecipeApp:
         results_container.pack(fill=BOTH, expand=True, padx=10, pady=10)
         
         self.canvas = Canvas(results_container, bg='white', highlightthickness=0)
-        scrollbar = Scrollbar(results_container, orient="vertical", command=self.canvas.yview)
+        # التحميل المسبق يتبع تمرير المستخدم فقط (شريط التمرير والعجلة)، لا تغيّر scrollregion عند إضافة البطاقات
+        scrollbar = Scrollbar(results_container, orient="vertical", command=self.on_results_scroll)
         self.scrollable_frame = Frame(self.canvas, bg='white')
         
         self.scrollable_frame.bind(
@@ -248,6 +283,9 @@ class RecipeApp:
         
         self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
         self.canvas.configure(yscrollcommand=scrollbar.set)
+        # عجلة الفأرة على مستوى التطبيق (تصل للبطاقات فوق الـ canvas أيضاً)؛ تُزال في close_resources
+        for sequence in WHEEL_SEQUENCES:
+            self.window.bind_all(sequence, self.on_results_wheel)
         
         self.canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -291,38 +329,63 @@ class RecipeApp:
         for widget in self.scrollable_frame.winfo_children():
             widget.destroy()
         self.current_images.clear()
-        self.image_cache.clear()
+        self.image_pool.cancel_all()  # صور البحث السابق لم تعد مطلوبة
+        self.recipes = []
+        
+        self.search_generation += 1
+        generation = self.search_generation
+        results = queue.Queue()
+        
+        # البحث على حلقة asyncio المشتركة: كل وصفة تصل للواجهة عبر callback وتُعرض على دفعات
+        if self.search_future is not None:
+            self.search_future.cancel()
+        self.search_future = self.async_bridge.stream(
+            self.async_api_handler.iter_recipes_by_ingredients(ingredients, number=5, include_details=False),
+            on_item=results.put,
+            on_done=lambda _: results.put(None),  # نهاية النتائج
+            on_error=results.put
+        )
+        
+        self.window.after(RENDER_INTERVAL_MS, self.render_pending_results, generation, results, ingredients)
+    
+    def render_pending_results(self, generation, results, ingredients):
+        """إضافة البطاقات الجاهزة على دفعات من thread البحث"""
+        # تجاهل نتائج بحث قديم بدأ المستخدم بعده بحثاً جديداً
+        if generation != self.search_generation or not self.window.winfo_exists():
+            return
         
-        # البحث في thread منفصل
-        def search_thread():
+        for _ in range(RENDER_BATCH_SIZE):
             try:
-                self.recipes = self.api_handler.fetch_recipes_by_ingredients(ingredients, number=5)
-                
-                self.window.after(0, lambda: self.display_search_results(ingredients))
-                
-            except Exception as e:
-                self.window.after(0, lambda: self.handle_search_error(e))
+                item = results.get_nowait()
+            except queue.Empty:
+                break
+            
+            if item is None:
+                self.display_search_results(ingredients)
+                return
+            if isinstance(item, Exception):
+                self.handle_search_error(item)
+                return
+            
+            self.recipes.append(item)
+            card_frame = self.create_recipe_card_basic(len(self.recipes), item)
+            self.load_card_image(card_frame, priority=len(self.recipes))
         
-        thread = threading.Thread(target=search_thread, daemon=True)
-        thread.start()
+        if self.recipes:
+            self.status_bar.config(text=f"Loaded {len(self.recipes)} recipes...")
+        self.window.after(RENDER_INTERVAL_MS, self.render_pending_results, generation, results, ingredients)
     
     def display_search_results(self, ingredients):
-        """عرض نتائج البحث"""
+        """إنهاء عرض نتائج البحث"""
         if self.recipes:
-            self.display_results_basic()
-            self.load_images_in_background()
-            
             # حفظ في تاريخ البحث
-            try:
-                self.db_manager.add_search_history(
-                    self.user_data["user_id"],
-                    ingredients,
-                    len(self.recipes)
-                )
-            except Exception as e:
-                print(f"Note: Could not save search history: {e}")
+            self.history_writer.log_search(
+                self.user_data["user_id"],
+                ingredients,
+                len(self.recipes)
+            )
             
-            self.status_bar.config(text=f"Found {len(self.recipes)} recipes with full details")
+            self.status_bar.config(text=f"Found {len(self.recipes)} recipes")
         else:
             no_results = Label(self.scrollable_frame,
                              text="No recipes found. Try different ingredients.",
@@ -340,11 +403,6 @@ class RecipeApp:
         self.status_bar.config(text="Search error")
         self.search_btn.config(state=NORMAL)
     
-    def display_results_basic(self):
-        """عرض النتائج الأساسية"""
-        for i, recipe in enumerate(self.recipes, 1):
-            self.create_recipe_card_basic(i, recipe)
-    
     def create_recipe_card_basic(self, index, recipe):
         """إنشاء بطاقة وصفة أساسية"""
         card_frame = Frame(self.scrollable_frame,
@@ -355,8 +413,11 @@ class RecipeApp:
                           pady=10)
         card_frame.pack(fill=X, padx=5, pady=5)
         
-        card_frame.recipe_id = recipe.get('id')
+        card_frame.recipe_id = recipe.id
         card_frame.recipe_data = recipe
+        card_frame.image_loaded = False
+        # تحميل التفاصيل مسبقاً عند مرور المؤشر فوق البطاقة
+        card_frame.bind('<Enter>', lambda e, rid=recipe.id: self.prefetch_details([rid]))
         
         content_frame = Frame(card_frame, bg='white')
         content_frame.pack(fill=X)
@@ -378,7 +439,7 @@ class RecipeApp:
         info_frame = Frame(content_frame, bg='white')
         info_frame.pack(side=LEFT, fill=BOTH, expand=True)
         
-        title = recipe.get('title', 'No Title')
+        title = recipe.title
         title_label = Label(info_frame,
                           text=f"{index}. {title}",
                           font=('Arial', 12, 'bold'),
@@ -388,17 +449,17 @@ class RecipeApp:
         title_label.pack(anchor='w')
         
         # معلومات إضافية
-        if recipe.get('readyInMinutes'):
+        if recipe.ready_in_minutes:
             time_label = Label(info_frame,
-                             text=f"⏱️ {recipe.get('readyInMinutes')} min | 👥 {recipe.get('servings', 1)} servings",
+                             text=f"⏱️ {recipe.ready_in_minutes} min | 👥 {recipe.servings or 1} servings",
                              font=('Arial', 9),
                              bg='white',
                              fg='#7F8C8D',
                              anchor='w')
             time_label.pack(anchor='w', pady=(2, 0))
         
-        used = recipe.get('usedIngredientCount', 0)
-        missed = recipe.get('missedIngredientCount', 0)
+        used = recipe.used_ingredient_count
+        missed = recipe.missed_ingredient_count
         
         if used > 0 or missed > 0:
             stats_frame = Frame(info_frame, bg='white')
@@ -421,7 +482,7 @@ class RecipeApp:
                fg='white',
                command=lambda r=recipe: self.show_full_recipe(r)).pack(side=LEFT, padx=(0, 5))
         
-        recipe_id = recipe.get('id')
+        recipe_id = recipe.id
         is_fav = self.db_manager.is_favorite(self.user_data["user_id"], recipe_id)
         
         fav_text = "⭐ Remove Favorite" if is_fav else "☆ Add to Favorites"
@@ -433,28 +494,114 @@ class RecipeApp:
                bg=fav_color,
                fg='white',
                command=lambda r=recipe: self.toggle_favorite(r)).pack(side=LEFT)
+        
+        return card_frame
+    
+    def on_results_scroll(self, *args):
+        """تمرير النتائج من شريط التمرير"""
+        self.canvas.yview(*args)
+        self.schedule_prefetch()
+    
+    def on_results_wheel(self, event):
+        """تمرير النتائج بعجلة الفأرة عندما يكون المؤشر فوقها"""
+        widget_path, canvas_path = str(event.widget), str(self.canvas)
+        if widget_path != canvas_path and not widget_path.startswith(canvas_path + '.'):
+            return
+        step = -1 if event.num == 4 or event.delta > 0 else 1
+        self.canvas.yview_scroll(step, 'units')
+        self.schedule_prefetch()
+    
+    def schedule_prefetch(self):
+        """جدولة التحميل المسبق للبطاقات الظاهرة بعد توقف التمرير"""
+        if not self.recipes:
+            return
+        if self.prefetch_job:
+            self.window.after_cancel(self.prefetch_job)
+        self.prefetch_job = self.window.after(PREFETCH_SCROLL_DELAY_MS, self.prefetch_visible_details)
+    
+    def prefetch_visible_details(self):
+        """تحميل مسبق لتفاصيل البطاقات الظاهرة في منطقة العرض"""
+        self.prefetch_job = None
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        
+        visible_ids = []
+        for card_frame in self.scrollable_frame.winfo_children():
+            if hasattr(card_frame, 'recipe_id'):
+                card_top = card_frame.winfo_y()
+                if card_top + card_frame.winfo_height() >= top and card_top <= bottom:
+                    visible_ids.append(card_frame.recipe_id)
+                    # صور البطاقات الظاهرة تتقدم على باقي الطابور
+                    if not card_frame.image_loaded:
+                        self.load_card_image(card_frame, priority=0)
+        
+        self.prefetch_details(visible_ids)
+    
+    def prefetch_details(self, recipe_ids):
+        """جلب التفاصيل في الخلفية للوصفات غير المحمّلة بعد"""
+        recipe_ids = [
+            recipe_id for recipe_id in recipe_ids
+            if recipe_id and recipe_id not in self.recipe_details and recipe_id not in self.prefetching
+        ]
+        if not recipe_ids:
+            return
+        
+        self.prefetching.update(recipe_ids)
+        
+        self.async_bridge.submit(
+            self.async_api_handler.get_recipe_details_bulk(recipe_ids, self.api_handler.detail_timeout),
+            on_success=lambda details_list: self.store_prefetched_details(recipe_ids, details_list),
+            on_error=lambda e: self.store_prefetched_details(recipe_ids, [])
+        )
+    
+    def store_prefetched_details(self, recipe_ids, details_list):
+        """حفظ التفاصيل المحمّلة مسبقاً"""
+        self.prefetching.difference_update(recipe_ids)
+        for details in details_list:
+            self.recipe_details[details.id] = details
     
     def show_full_recipe(self, recipe):
-        """عرض الوصفة الكاملة"""
-        # حفظ في تاريخ المشاهدة
-        try:
-            recipe_id = recipe.get('id')
-            recipe_title = recipe.get('title', 'No Title')
-            recipe_data = json.dumps(recipe)
+        """عرض الوصفة الكاملة (مع جلب التفاصيل عند الحاجة)"""
+        recipe_id = recipe.id
+        if recipe_id in self.recipe_details:
+            recipe.merge_details(self.recipe_details[recipe_id])  # دمج التفاصيل الكاملة
+        
+        if recipe_id and not recipe.has_details:
+            self.status_bar.config(text=f"Loading: {recipe.title}...")
             
-            self.db_manager.add_to_view_history(
-                self.user_data["user_id"],
-                recipe_id,
-                recipe_title,
-                recipe_data
+            self.async_bridge.submit(
+                self.async_api_handler.get_recipe_details(recipe_id, self.api_handler.detail_timeout),
+                on_success=lambda details: self.on_details_loaded(recipe, details),
+                on_error=lambda e: self.on_details_loaded(recipe, None)
             )
-        except Exception as e:
-            print(f"Note: Could not save to view history: {e}")
+            return
+        
+        self.open_full_recipe(recipe)
+    
+    def on_details_loaded(self, recipe, details):
+        """عرض الوصفة بعد وصول تفاصيلها"""
+        if details:
+            self.recipe_details[details.id] = details
+            recipe.merge_details(details)
+        else:
+            # عرض الملخص فقط إذا فشل جلب التفاصيل
+            print(f"Could not load details for recipe {recipe.id}")
+        self.open_full_recipe(recipe)
+    
+    def open_full_recipe(self, recipe):
+        """حفظ الوصفة في تاريخ المشاهدة وعرضها"""
+        # حفظ في تاريخ المشاهدة
+        self.history_writer.log_view(
+            self.user_data["user_id"],
+            recipe.id,
+            recipe.title,
+            recipe
+        )
         
         # عرض الوصفة
         self.display_full_recipe(recipe)
         self.notebook.select(1)  # التبديل لتبويب التفاصيل
-        self.status_bar.config(text=f"Viewing: {recipe.get('title', 'Recipe')}")
+        self.status_bar.config(text=f"Viewing: {recipe.title}")
     
     def display_full_recipe(self, recipe):
         """عرض الوصفة الكاملة"""
@@ -467,7 +614,7 @@ class RecipeApp:
         main_frame.pack(fill=BOTH, expand=True)
         
         # عنوان الوصفة
-        title = recipe.get('title', 'No Title')
+        title = recipe.title
         title_label = Label(main_frame,
                           text=title,
                           font=('Arial', 20, 'bold'),
@@ -482,9 +629,9 @@ class RecipeApp:
         info_frame.pack(fill=X, pady=(0, 20))
         
         # وقت التحضير والمقادير
-        ready_time = recipe.get('readyInMinutes', 0)
-        servings = recipe.get('servings', 0)
-        health_score = recipe.get('healthScore', 0)
+        ready_time = recipe.ready_in_minutes
+        servings = recipe.servings
+        health_score = recipe.health_score
         
         info_text = f"⏱️ Ready in: {ready_time} minutes"
         if servings > 0:
@@ -499,16 +646,16 @@ class RecipeApp:
               fg='#2C3E50').pack(anchor='w')
         
         # الأنواع والأطباق
-        if recipe.get('diets'):
-            diets = ", ".join(recipe.get('diets', []))
+        if recipe.diets:
+            diets = ", ".join(recipe.diets)
             Label(info_frame,
                   text=f"🥗 Diets: {diets}",
                   font=('Arial', 11),
                   bg='#F8FAFF',
                   fg='#27AE60').pack(anchor='w', pady=(5, 0))
         
-        if recipe.get('cuisines'):
-            cuisines = ", ".join(recipe.get('cuisines', []))
+        if recipe.cuisines:
+            cuisines = ", ".join(recipe.cuisines)
             Label(info_frame,
                   text=f"🌍 Cuisines: {cuisines}",
                   font=('Arial', 11),
@@ -534,29 +681,19 @@ class RecipeApp:
         ingredients_listbox.pack(fill=X, pady=(0, 10))
         
         # إضافة المكونات
-        extended_ingredients = recipe.get('extendedIngredients', [])
-        if extended_ingredients:
-            for ing in extended_ingredients:
-                name = ing.get('name', '')
-                amount = ing.get('amount', 0)
-                unit = ing.get('unit', '')
-                original = ing.get('original', f"{amount} {unit} {name}".strip())
-                ingredients_listbox.insert(END, f"• {original}")
+        if recipe.ingredients:
+            for ing in recipe.ingredients:
+                ingredients_listbox.insert(END, f"• {ing.display_text()}")
         else:
             # استخدام المكونات البسيطة إذا لم تكن هناك تفاصيل
-            used_ingredients = recipe.get('usedIngredients', [])
-            missed_ingredients = recipe.get('missedIngredients', [])
-            
-            if used_ingredients:
+            if recipe.used_ingredients:
                 ingredients_listbox.insert(END, "✅ Used Ingredients:")
-                for ing in used_ingredients[:10]:
-                    name = ing.get('name', 'Unknown')
+                for name in recipe.used_ingredients[:10]:
                     ingredients_listbox.insert(END, f"  • {name}")
             
-            if missed_ingredients:
+            if recipe.missed_ingredients:
                 ingredients_listbox.insert(END, "\n❌ Missing Ingredients:")
-                for ing in missed_ingredients[:5]:
-                    name = ing.get('name', 'Unknown')
+                for name in recipe.missed_ingredients[:5]:
                     ingredients_listbox.insert(END, f"  • {name}")
         
         # الخطوات
@@ -580,22 +717,18 @@ class RecipeApp:
         instructions_text.pack(fill=BOTH, expand=True)
         
         # تحليل التعليمات
-        analyzed_instructions = recipe.get('analyzedInstructions', [])
-        if analyzed_instructions:
-            for section in analyzed_instructions:
-                section_name = section.get('name', 'Instructions')
+        if recipe.instruction_sections:
+            for section in recipe.instruction_sections:
+                section_name = section.name
                 if section_name and section_name != 'Instructions':
                     instructions_text.insert(END, f"\n{section_name}:\n")
                 
-                steps = section.get('steps', [])
-                for step in steps:
-                    step_num = step.get('number', 0)
-                    step_text = step.get('step', '')
-                    if step_text:
-                        instructions_text.insert(END, f"\n{step_num}. {step_text}\n")
+                for step in section.steps:
+                    if step.step:
+                        instructions_text.insert(END, f"\n{step.number}. {step.step}\n")
         else:
             # استخدام التعليمات النصية البسيطة
-            instructions = recipe.get('instructions', '')
+            instructions = recipe.instructions
             if instructions:
                 instructions_text.insert(END, instructions)
             else:
@@ -608,7 +741,7 @@ class RecipeApp:
         control_frame.pack(fill=X, pady=(20, 0))
         
         # زر المفضلة
-        recipe_id = recipe.get('id')
+        recipe_id = recipe.id
         is_fav = self.db_manager.is_favorite(self.user_data["user_id"], recipe_id)
         
         fav_text = "⭐ Remove from Favorites" if is_fav else "☆ Add to Favorites"
@@ -632,8 +765,10 @@ class RecipeApp:
     
     def toggle_favorite(self, recipe):
         """إضافة/إزالة من المفضلة"""
-        recipe_id = recipe.get('id')
-        title = recipe.get('title', 'No Title')
+        recipe_id = recipe.id
+        if recipe_id in self.recipe_details:
+            recipe.merge_details(self.recipe_details[recipe_id])  # حفظ التفاصيل إن كانت محمّلة
+        title = recipe.title
         image_url = self.api_handler.get_recipe_image_url(recipe)
         ingredients = self.ingredients_entry.get()
         
@@ -692,35 +827,25 @@ class RecipeApp:
         container = Frame(history_window, bg='#F8FAFF')
         container.pack(fill=BOTH, expand=True, padx=20, pady=(0, 20))
         
-        # الحصول على التاريخ
-        history = self.db_manager.get_view_history(self.user_data["user_id"], limit=20)
+        user_id = self.user_data["user_id"]
+        self.history_writer.flush()  # إظهار المشاهدات التي لم تُحفظ بعد
+        history_count = self.db_manager.get_view_history_count(user_id)
         
-        if not history:
+        if not history_count:
             Label(container,
                   text="No recently viewed recipes.",
                   font=('Arial', 12),
                   bg='#F8FAFF',
                   fg='#7F8C8D').pack(pady=50)
         else:
-            # Canvas للتاريخ
-            history_canvas = Canvas(container, bg='#F8FAFF', highlightthickness=0)
-            scrollbar = Scrollbar(container, orient="vertical", command=history_canvas.yview)
-            history_frame = Frame(history_canvas, bg='#F8FAFF')
-            
-            history_frame.bind(
-                "<Configure>",
-                lambda e: history_canvas.configure(scrollregion=history_canvas.bbox("all"))
-            )
-            
-            history_canvas.create_window((0, 0), window=history_frame, anchor="nw")
-            history_canvas.configure(yscrollcommand=scrollbar.set)
-            
-            history_canvas.pack(side="left", fill="both", expand=True)
-            scrollbar.pack(side="right", fill="y")
-            
-            # عرض كل وصفة في التاريخ
-            for item in history:
-                self.create_history_item(history_frame, item, history_window)
+            # قائمة افتراضية: الصفوف الظاهرة فقط، والبيانات تُقرأ صفحة صفحة
+            VirtualList(container,
+                        history_count,
+                        fetch_page=lambda offset, limit, after: self.db_manager.get_view_history_page(
+                            user_id, limit, after=after and after['cursor'], offset=offset),
+                        build_row=self.build_list_row,
+                        bind_row=lambda row, item: self.bind_history_row(row, item, history_window),
+                        row_height=LIST_ROW_HEIGHT).pack(fill=BOTH, expand=True)
         
         # إطار للأزرار
         button_frame = Frame(history_window, bg='#F8FAFF')
@@ -740,54 +865,124 @@ class RecipeApp:
                fg='white',
                command=history_window.destroy).pack(side=RIGHT, padx=5)
     
-    def create_history_item(self, parent_frame, history_item, history_window):
-        """إنشاء عنصر في التاريخ"""
-        frame = Frame(parent_frame,
-                     bg='white',
-                     relief=GROOVE,
-                     borderwidth=1,
-                     padx=15,
-                     pady=10)
-        frame.pack(fill=X, padx=5, pady=5)
-        
-        title = history_item.get('recipe_title', 'Unknown Recipe')
-        viewed_at = history_item.get('viewed_at', '')
-        recipe_data = history_item.get('recipe_data', {})
+    def build_list_row(self, parent):
+        """إنشاء صف فارغ قابل لإعادة الاستخدام في قوائم التاريخ والمفضلة"""
+        row = Frame(parent,
+                    bg='white',
+                    relief=GROOVE,
+                    borderwidth=1,
+                    padx=15,
+                    pady=10)
+        row.image_url = None
+        row.photo = None
+        
+        image_frame = Frame(row, bg='#F0F0F0', width=LIST_THUMBNAIL_SIZE[0], height=LIST_THUMBNAIL_SIZE[1])
+        image_frame.pack(side=LEFT, padx=(0, 15))
+        image_frame.pack_propagate(False)
+        row.image_label = Label(image_frame, bg='#F0F0F0')
+        row.image_label.pack(fill=BOTH, expand=True)
         
-        Label(frame,
-              text=title,
-              font=('Arial', 12, 'bold'),
-              bg='white',
-              fg='#2C3E50',
-              anchor='w').pack(anchor='w')
+        text_frame = Frame(row, bg='white')
+        text_frame.pack(side=LEFT, fill=BOTH, expand=True)
         
-        if viewed_at:
-            Label(frame,
-                  text=f"📅 Viewed: {viewed_at}",
-                  font=('Arial', 9),
-                  bg='white',
-                  fg='#7F8C8D',
-                  anchor='w').pack(anchor='w', pady=(2, 0))
+        row.title_label = Label(text_frame,
+                                font=('Arial', 12, 'bold'),
+                                bg='white',
+                                fg='#2C3E50',
+                                anchor='w')
+        row.title_label.pack(anchor='w')
+        
+        row.info_label = Label(text_frame,
+                               font=('Arial', 9),
+                               bg='white',
+                               anchor='w')
+        row.info_label.pack(anchor='w', pady=(2, 0))
+        
+        row.extra_label = Label(text_frame,
+                                font=('Arial', 9),
+                                bg='white',
+                                fg='#7F8C8D',
+                                anchor='w')
+        row.extra_label.pack(anchor='w', pady=(2, 0))
+        
+        # أزرار التحكم
+        btn_frame = Frame(row, bg='white')
+        btn_frame.pack(side=RIGHT)
+        
+        row.view_button = Button(btn_frame,
+                                 text="👁️ View Recipe",
+                                 font=('Arial', 9),
+                                 bg='#3498DB',
+                                 fg='white')
+        row.view_button.pack(side=LEFT, padx=2)
+        
+        row.remove_button = Button(btn_frame,
+                                   text="🗑️ Remove",
+                                   font=('Arial', 9),
+                                   bg='#E74C3C',
+                                   fg='white')
+        return row
+    
+    def bind_history_row(self, row, history_item, history_window):
+        """تعبئة صف بعنصر من التاريخ (صف خفيف: الوصفة تُفك عند فتحها فقط)"""
+        viewed_at = history_item.get('viewed_at', '')
         
+        row.title_label.config(text=history_item.get('recipe_title', 'Unknown Recipe'))
+        row.info_label.config(text=f"📅 Viewed: {viewed_at}" if viewed_at else "", fg='#7F8C8D')
+        row.extra_label.config(text="")
         # تمرير history_window كمعلمة
-        Button(frame,
-               text="👁️ View Recipe",
-               font=('Arial', 9),
-               bg='#3498DB',
-               fg='white',
-               command=lambda r=recipe_data, hw=history_window: self.view_history_recipe(r, hw)).pack(anchor='e', pady=(5, 0))
+        row.view_button.config(command=lambda h=history_item, hw=history_window: self.view_history_recipe(h, hw))
+        
+        self.load_row_thumbnail(row, self.api_handler.resolve_image_url(history_item['recipe_image']))
+    
+    def load_row_thumbnail(self, row, image_url):
+        """عرض المصغّرة من الذاكرة فوراً أو تحميلها عبر مجمع صور القوائم"""
+        row.image_url = image_url
+        if not image_url:
+            self.show_row_thumbnail(row, image_url, self.api_handler.draw_default_image(LIST_THUMBNAIL_SIZE))
+            return
+        
+        image = self.api_handler.thumbnail_cache.get_memory(image_url, LIST_THUMBNAIL_SIZE)
+        if image is not None:
+            self.show_row_thumbnail(row, image_url, image)
+            return
+        
+        row.photo = None
+        row.image_label.config(image='')
+        self.list_image_pool.submit(
+            (id(row), image_url),
+            self.api_handler.load_thumbnail,
+            (image_url, LIST_THUMBNAIL_SIZE),
+            on_done=lambda image: self.deliver_row_thumbnail(row, image_url, image)
+        )
+    
+    def deliver_row_thumbnail(self, row, image_url, image):
+        """تسليم مصغّرة الصف لـ thread الواجهة"""
+        try:
+            self.window.after(0, self.show_row_thumbnail, row, image_url, image)
+        except Exception as e:
+            print(f"Could not deliver image: {e}")
+    
+    def show_row_thumbnail(self, row, image_url, image):
+        """عرض المصغّرة إذا كان الصف ما زال يعرض نفس العنصر"""
+        if image is None or not row.winfo_exists() or row.image_url != image_url:
+            return
+        row.photo = ImageTk.PhotoImage(image)
+        row.image_label.config(image=row.photo)
     
-    def view_history_recipe(self, recipe_data, history_window):
+    def view_history_recipe(self, history_item, history_window):
         """عرض وصفة من التاريخ"""
+        recipe_data = self.db_manager.get_recipe(history_item['recipe_id'], history_item['recipe_title'])
         history_window.destroy()
         self.display_full_recipe(recipe_data)
         self.notebook.select(1)
-        self.status_bar.config(text=f"Viewing from history: {recipe_data.get('title', 'Recipe')}")
+        self.status_bar.config(text=f"Viewing from history: {recipe_data.title}")
     
     def clear_view_history(self, history_window):
         """مسح تاريخ المشاهدة"""
         if messagebox.askyesno("Clear History", "Are you sure you want to clear all view history?"):
             try:
+                self.history_writer.flush()
                 self.db_manager.clear_view_history(self.user_data["user_id"])
                 messagebox.showinfo("Success", "View history cleared!")
                 history_window.destroy()
@@ -812,35 +1007,25 @@ class RecipeApp:
         container = Frame(favorites_window, bg='#F8FAFF')
         container.pack(fill=BOTH, expand=True, padx=20, pady=(0, 20))
         
-        # الحصول على المفضلة
-        favorites = self.db_manager.get_favorites(self.user_data["user_id"])
+        user_id = self.user_data["user_id"]
+        favorites_count = self.db_manager.get_favorites_count(user_id)
         
-        if not favorites:
+        if not favorites_count:
             Label(container,
                   text="No favorite recipes yet.",
                   font=('Arial', 12),
                   bg='#F8FAFF',
                   fg='#7F8C8D').pack(pady=50)
         else:
-            # Canvas للمفضلة
-            fav_canvas = Canvas(container, bg='#F8FAFF', highlightthickness=0)
-            scrollbar = Scrollbar(container, orient="vertical", command=fav_canvas.yview)
-            fav_frame = Frame(fav_canvas, bg='#F8FAFF')
-            
-            fav_frame.bind(
-                "<Configure>",
-                lambda e: fav_canvas.configure(scrollregion=fav_canvas.bbox("all"))
-            )
-            
-            fav_canvas.create_window((0, 0), window=fav_frame, anchor="nw")
-            fav_canvas.configure(yscrollcommand=scrollbar.set)
-            
-            fav_canvas.pack(side="left", fill="both", expand=True)
-            scrollbar.pack(side="right", fill="y")
-            
-            # عرض كل وصفة مفضلة
-            for fav in favorites:
-                self.create_favorite_item(fav_frame, fav, favorites_window)
+            # قائمة افتراضية: الصفوف الظاهرة فقط، والبيانات تُقرأ صفحة صفحة
+            favorites_list = VirtualList(container,
+                                         favorites_count,
+                                         fetch_page=lambda offset, limit, after: self.db_manager.get_favorites_page(
+                                             user_id, limit, after=after and after['cursor'], offset=offset),
+                                         build_row=self.build_list_row,
+                                         bind_row=lambda row, item: self.bind_favorite_row(row, item, favorites_list, favorites_window),
+                                         row_height=LIST_ROW_HEIGHT)
+            favorites_list.pack(fill=BOTH, expand=True)
         
         Button(favorites_window,
                text="✕ Close",
@@ -849,82 +1034,43 @@ class RecipeApp:
                fg='white',
                command=favorites_window.destroy).pack(pady=10)
     
-    def create_favorite_item(self, parent_frame, favorite, favorites_window):
-        """إنشاء عنصر في المفضلة"""
-        frame = Frame(parent_frame,
-                     bg='white',
-                     relief=GROOVE,
-                     borderwidth=1,
-                     padx=15,
-                     pady=10)
-        frame.pack(fill=X, padx=5, pady=5)
-        
-        title = favorite.get('recipe_title', 'Unknown Recipe')
+    def bind_favorite_row(self, row, favorite, favorites_list, favorites_window):
+        """تعبئة صف بوصفة مفضلة (صف خفيف: الوصفة تُفك عند فتحها فقط)"""
         saved_date = favorite.get('saved_date', '')
-        recipe_data = favorite.get('recipe_data', {})
         
-        Label(frame,
-              text=title,
-              font=('Arial', 12, 'bold'),
-              bg='white',
-              fg='#2C3E50',
-              anchor='w').pack(anchor='w')
-        
-        if saved_date:
-            Label(frame,
-                  text=f"⭐ Saved: {saved_date}",
-                  font=('Arial', 9),
-                  bg='white',
-                  fg='#F39C12',
-                  anchor='w').pack(anchor='w', pady=(2, 0))
-        
-        if favorite.get('ingredients'):
-            ingredients_text = favorite.get('ingredients')
-            if len(ingredients_text) > 50:
-                ingredients_text = ingredients_text[:47] + "..."
-            Label(frame,
-                  text=f"🔍 Search: {ingredients_text}",
-                  font=('Arial', 9),
-                  bg='white',
-                  fg='#7F8C8D',
-                  anchor='w').pack(anchor='w', pady=(2, 0))
+        row.title_label.config(text=favorite.get('recipe_title', 'Unknown Recipe'))
+        row.info_label.config(text=f"⭐ Saved: {saved_date}" if saved_date else "", fg='#F39C12')
         
-        # أزرار التحكم
-        btn_frame = Frame(frame, bg='white')
-        btn_frame.pack(anchor='e', pady=(5, 0))
+        ingredients_text = favorite.get('ingredients') or ''
+        if len(ingredients_text) > 50:
+            ingredients_text = ingredients_text[:47] + "..."
+        row.extra_label.config(text=f"🔍 Search: {ingredients_text}" if ingredients_text else "")
         
-        Button(btn_frame,
-               text="👁️ View Recipe",
-               font=('Arial', 9),
-               bg='#3498DB',
-               fg='white',
-               command=lambda r=recipe_data, fw=favorites_window: self.view_favorite_recipe(r, fw)).pack(side=LEFT, padx=2)
+        row.view_button.config(command=lambda f=favorite, fw=favorites_window: self.view_favorite_recipe(f, fw))
+        row.remove_button.config(command=lambda f=favorite, fl=favorites_list, fw=favorites_window: self.remove_from_favorites_gui(f['recipe_id'], fl, fw))
+        row.remove_button.pack(side=LEFT, padx=2)
         
-        Button(btn_frame,
-               text="🗑️ Remove",
-               font=('Arial', 9),
-               bg='#E74C3C',
-               fg='white',
-               command=lambda r=recipe_data, f=frame, fw=favorites_window: self.remove_from_favorites_gui(r, f, fw)).pack(side=LEFT, padx=2)
+        self.load_row_thumbnail(row, self.api_handler.resolve_image_url(favorite['recipe_image']))
     
-    def view_favorite_recipe(self, recipe_data, favorites_window):
+    def view_favorite_recipe(self, favorite, favorites_window):
         """عرض وصفة من المفضلة"""
+        recipe_data = self.db_manager.get_recipe(favorite['recipe_id'], favorite['recipe_title'])
         favorites_window.destroy()
         self.display_full_recipe(recipe_data)
         self.notebook.select(1)
-        self.status_bar.config(text=f"Viewing favorite: {recipe_data.get('title', 'Recipe')}")
+        self.status_bar.config(text=f"Viewing favorite: {recipe_data.title}")
     
-    def remove_from_favorites_gui(self, recipe_data, item_frame, favorites_window):
+    def remove_from_favorites_gui(self, recipe_id, favorites_list, favorites_window):
         """إزالة وصفة من المفضلة من واجهة GUI"""
-        recipe_id = recipe_data.get('id')
         if recipe_id:
             success = self.db_manager.remove_from_favorites(self.user_data["user_id"], recipe_id)
             if success:
-                item_frame.destroy()
+                remaining = self.db_manager.get_favorites_count(self.user_data["user_id"])
+                favorites_list.refresh(remaining)
                 messagebox.showinfo("Success", "Removed from favorites!")
                 
                 # إذا لم يعد هناك وصفات، أعد تحميل النافذة
-                if not self.db_manager.get_favorites(self.user_data["user_id"]):
+                if not remaining:
                     favorites_window.destroy()
                     self.show_favorites()
             else:
@@ -932,40 +1078,59 @@ class RecipeApp:
     
     def load_images_in_background(self):
         """تحميل الصور في الخلفية"""
-        for card_frame in self.scrollable_frame.winfo_children():
+        for index, card_frame in enumerate(self.scrollable_frame.winfo_children()):
             if hasattr(card_frame, 'recipe_data'):
-                recipe = card_frame.recipe_data
-                recipe_id = recipe.get('id')
-                
-                if recipe_id not in self.image_cache:
-                    thread = threading.Thread(
-                        target=self.load_single_image,
-                        args=(recipe, card_frame)
-                    )
-                    thread.daemon = True
-                    thread.start()
-    
-    def load_single_image(self, recipe, card_frame):
-        """تحميل صورة واحدة"""
+                self.load_card_image(card_frame, priority=index)
+    
+    def load_card_image(self, card_frame, priority=0):
+        """تحميل صورة بطاقة واحدة عبر مجمع العمال (الأولوية الأصغر أولاً)"""
+        recipe = card_frame.recipe_data
+        image_url = self.api_handler.get_recipe_image_url(recipe)
+        
+        # الصور المعروضة مؤخراً تظهر فوراً من الذاكرة دون thread أو شبكة
+        image = self.api_handler.thumbnail_cache.get_memory(image_url, (100, 100)) if image_url else None
+        if image is not None:
+            self.update_image_display(card_frame, image)
+            return
+        
+        self.image_pool.submit(
+            recipe.id,
+            self.load_single_image,
+            (image_url,),
+            priority=priority,
+            on_done=lambda image: self.deliver_image(card_frame, image)
+        )
+    
+    def load_single_image(self, image_url):
+        """تحميل وفك وتصغير صورة واحدة (داخل عامل من مجمع الصور)"""
         try:
-            image_url = self.api_handler.get_recipe_image_url(recipe)
             if image_url:
-                photo = self.api_handler.load_image_from_url(image_url, size=(100, 100))
-                recipe_id = recipe.get('id')
-                self.image_cache[recipe_id] = photo
-                self.window.after(0, self.update_image_display, card_frame, photo)
+                return self.api_handler.load_thumbnail(image_url, size=(100, 100))
         except Exception as e:
             print(f"Error loading image: {e}")
+        return None
     
-    def update_image_display(self, card_frame, photo):
-        """تحديث عرض الصورة"""
+    def deliver_image(self, card_frame, image):
+        """تسليم بكسلات الصورة الجاهزة لـ thread الواجهة"""
+        if image is None:
+            return
+        try:
+            self.window.after(0, self.update_image_display, card_frame, image)
+        except Exception as e:
+            # النافذة أُغلقت قبل انتهاء التحميل
+            print(f"Could not deliver image: {e}")
+    
+    def update_image_display(self, card_frame, image):
+        """تحديث عرض الصورة (PhotoImage يُنشأ هنا في thread الواجهة)"""
         if card_frame.winfo_exists():
+            photo = ImageTk.PhotoImage(image)
             for widget in card_frame.image_frame.winfo_children():
                 widget.destroy()
             
             image_label = Label(card_frame.image_frame, image=photo, bg='white')
             image_label.pack(fill=BOTH, expand=True)
             self.current_images.append(photo)
+            card_frame.image_loaded = True
     
     def create_status_bar(self):
         """إنشاء شريط الحالة"""
@@ -977,12 +1142,43 @@ class RecipeApp:
                                anchor='w',
                                padx=10)
         self.status_bar.pack(side=BOTTOM, fill=X)
+        
+        # النقاط المتبقية من حصة API اليومية
+        self.quota_label = Label(self.status_bar,
+                                 text="",
+                                 bg='#5D7B9D',
+                                 fg='white',
+                                 font=('Arial', 9))
+        self.quota_label.pack(side=RIGHT)
+        self.refresh_quota_status()
+    
+    def refresh_quota_status(self):
+        """تحديث عرض الحصة المتبقية دورياً"""
+        if not self.window.winfo_exists():
+            return
+        
+        status = self.api_handler.get_quota_status()
+        if status['quota_left'] is not None:
+            self.quota_label.config(text=f"🔋 API points left: {status['quota_left']:.1f}")
+        self.window.after(QUOTA_REFRESH_MS, self.refresh_quota_status)
     
     def logout(self):
         """تسجيل الخروج"""
         if messagebox.askyesno("Logout", "Are you sure you want to logout?"):
+            self.close_resources()
             self.window.destroy()
             self.login_window.deiconify()
+    
+    def close_resources(self):
+        """حفظ التاريخ المنتظر وإيقاف العمال والجلسات"""
+        self.history_writer.close()
+        self.image_pool.shutdown()
+        self.list_image_pool.shutdown()
+        # ربط العجلة على مستوى التطبيق يشير لهذا الكائن: يُزال حتى لا يبقى بعد الخروج
+        for sequence in WHEEL_SEQUENCES:
+            self.window.unbind_all(sequence)
+        self.async_bridge.stop(self.async_api_handler.close())
+        self.api_handler.close()
 
 if __name__ == "__main__":
     print("✅ Recipe App Module Loaded Successfully")
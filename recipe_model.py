@@ -0,0 +1,184 @@
+import json
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Any
+
+# الحقول التي تأتي من طلب التفاصيل وتُدمج فوق ملخص نتيجة البحث
+DETAIL_ATTRIBUTES = (
+    'title', 'image', 'image_type', 'ready_in_minutes', 'servings', 'summary', 'instructions',
+    'source_url', 'spoonacular_source_url', 'health_score', 'price_per_serving',
+    'diets', 'dish_types', 'cuisines', 'ingredients', 'instruction_sections', 'extra'
+)
+
+@dataclass(slots=True)
+class Ingredient:
+    """مكوّن واحد من مكونات الوصفة"""
+    id: Optional[int] = None
+    name: str = ''
+    original: str = ''
+    amount: float = 0
+    unit: str = ''
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Ingredient':
+        return cls(
+            data.get('id'),
+            data.get('name', ''),
+            data.get('original', ''),
+            data.get('amount', 0),
+            data.get('unit', '')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'original': self.original,
+            'amount': self.amount,
+            'unit': self.unit
+        }
+
+    def display_text(self) -> str:
+        """النص المعروض في قائمة المكونات"""
+        return self.original or f"{self.amount} {self.unit} {self.name}".strip()
+
+@dataclass(slots=True)
+class Step:
+    """خطوة واحدة من خطوات التحضير"""
+    number: int = 0
+    step: str = ''
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Step':
+        return cls(data.get('number', 0), data.get('step', ''))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'number': self.number, 'step': self.step}
+
+@dataclass(slots=True)
+class InstructionSection:
+    """قسم من التعليمات (مثل: الصلصة، العجينة)"""
+    name: str = 'Instructions'
+    steps: List[Step] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'InstructionSection':
+        return cls(
+            data.get('name', 'Instructions'),
+            [Step.from_dict(step) for step in data.get('steps', [])]
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'steps': [step.to_dict() for step in self.steps]}
+
+@dataclass(slots=True)
+class Recipe:
+    """وصفة بحقول ثابتة بدلاً من قاموس حر (أقل ذاكرة وأسرع وصولاً)"""
+    id: Optional[int] = None
+    title: str = 'No Title'
+    image: str = ''
+    image_type: str = ''
+    ready_in_minutes: int = 0
+    servings: int = 0
+
+    # من نتائج البحث بالمكونات
+    used_ingredient_count: int = 0
+    missed_ingredient_count: int = 0
+    used_ingredients: List[str] = field(default_factory=list)
+    missed_ingredients: List[str] = field(default_factory=list)
+
+    # من طلب التفاصيل
+    summary: str = ''
+    instructions: str = ''
+    source_url: str = ''
+    spoonacular_source_url: str = ''
+    health_score: float = 0
+    price_per_serving: float = 0
+    diets: List[str] = field(default_factory=list)
+    dish_types: List[str] = field(default_factory=list)
+    cuisines: List[str] = field(default_factory=list)
+    ingredients: List[Ingredient] = field(default_factory=list)
+    instruction_sections: List[InstructionSection] = field(default_factory=list)
+    has_details: bool = False
+
+    # بيانات ملف 'full' فقط (التغذية والاستجابة الخام)
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Recipe':
+        """إنشاء وصفة من قاموس بصيغة Spoonacular (أو من بيانات مخزنة قديمة)"""
+        has_details = 'extendedIngredients' in data
+        extra = {key: data[key] for key in ('nutrition', 'full_details') if key in data} or None
+        return cls(
+            id=data.get('id'),
+            title=data.get('title', 'No Title'),
+            image=data.get('image', ''),
+            image_type=data.get('imageType', ''),
+            ready_in_minutes=data.get('readyInMinutes', 0) or 0,
+            servings=data.get('servings', 0) or 0,
+            used_ingredient_count=data.get('usedIngredientCount', 0),
+            missed_ingredient_count=data.get('missedIngredientCount', 0),
+            used_ingredients=[ing.get('name', 'Unknown') for ing in data.get('usedIngredients', [])],
+            missed_ingredients=[ing.get('name', 'Unknown') for ing in data.get('missedIngredients', [])],
+            summary=data.get('summary', ''),
+            instructions=data.get('instructions', '') or '',
+            source_url=data.get('sourceUrl', ''),
+            spoonacular_source_url=data.get('spoonacularSourceUrl', ''),
+            health_score=data.get('healthScore', 0) or 0,
+            price_per_serving=data.get('pricePerServing', 0) or 0,
+            diets=list(data.get('diets', [])),
+            dish_types=list(data.get('dishTypes', [])),
+            cuisines=list(data.get('cuisines', [])),
+            ingredients=[Ingredient.from_dict(ing) for ing in data.get('extendedIngredients', [])],
+            instruction_sections=[
+                InstructionSection.from_dict(section) for section in data.get('analyzedInstructions', [])
+            ],
+            has_details=has_details,
+            extra=extra
+        )
+
+    def to_dict(self, include_extra: bool = False) -> Dict[str, Any]:
+        """تحويل الوصفة إلى قاموس بصيغة Spoonacular (متوافق مع البيانات المخزنة)"""
+        data = {
+            'id': self.id,
+            'title': self.title,
+            'image': self.image,
+            'imageType': self.image_type,
+            'readyInMinutes': self.ready_in_minutes,
+            'servings': self.servings
+        }
+        if self.used_ingredient_count or self.missed_ingredient_count:
+            data['usedIngredientCount'] = self.used_ingredient_count
+            data['missedIngredientCount'] = self.missed_ingredient_count
+            data['usedIngredients'] = [{'name': name} for name in self.used_ingredients]
+            data['missedIngredients'] = [{'name': name} for name in self.missed_ingredients]
+        if self.has_details:
+            data.update({
+                'summary': self.summary,
+                'instructions': self.instructions,
+                'sourceUrl': self.source_url,
+                'spoonacularSourceUrl': self.spoonacular_source_url,
+                'healthScore': self.health_score,
+                'pricePerServing': self.price_per_serving,
+                'diets': self.diets,
+                'dishTypes': self.dish_types,
+                'cuisines': self.cuisines,
+                'extendedIngredients': [ing.to_dict() for ing in self.ingredients],
+                'analyzedInstructions': [section.to_dict() for section in self.instruction_sections]
+            })
+        if include_extra and self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_json(cls, text: str) -> 'Recipe':
+        return cls.from_dict(json.loads(text))
+
+    def to_json(self) -> str:
+        """ترميز مضغوط (بدون مسافات) للتخزين في قاعدة البيانات"""
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+    def merge_details(self, details: 'Recipe'):
+        """دمج التفاصيل الكاملة فوق ملخص نتيجة البحث"""
+        for attribute in DETAIL_ATTRIBUTES:
+            setattr(self, attribute, getattr(details, attribute))
+        self.has_details = details.has_details
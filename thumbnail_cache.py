@@ -0,0 +1,162 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from PIL import Image
+
+# مجلد المصغّرات بجانب ملفات التطبيق (لا يتبع مجلد التشغيل الحالي)
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thumbnail_cache')
+# عند تجاوز ميزانية القرص يُحذف حتى هذه النسبة منها، فلا يتكرر التنظيف مع كل كتابة تالية
+DISK_PRUNE_RATIO = 0.9
+
+class ThumbnailCache:
+    """ذاكرة مصغّرات من طبقتين: LRU في الذاكرة بميزانية بايتات + ملفات على القرص تبقى بين الجلسات"""
+
+    def __init__(self, cache_dir: str = THUMBNAIL_CACHE_DIR, memory_budget: int = 32 * 1024 * 1024,
+                 disk_budget: int = 200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.memory_bytes = 0
+        # حجم الملفات على القرص كما يُتتبَّع من الكتابات (يُصحَّح من القرص عند كل تنظيف)
+        self.disk_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._prune_disk()
+
+    def _key(self, url: str, size: Tuple[int, int]) -> str:
+        """اسم ملف ثابت مشتق من الرابط والحجم (sha256 للرابط لا لمحتوى الصورة)"""
+        return hashlib.sha256(f"{url}|{size[0]}x{size[1]}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        # مجلد فرعي بأول حرفين لتجنب آلاف الملفات في مجلد واحد
+        return os.path.join(self.cache_dir, key[:2], key + '.png')
+
+    def _image_bytes(self, image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, url: str, size: Tuple[int, int]) -> Optional[Image.Image]:
+        """البحث في الذاكرة ثم على القرص؛ يعيد None إذا لم تكن الصورة مخزنة"""
+        key = self._key(url, size)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                return image
+
+        path = self._path(key)
+        try:
+            with Image.open(path) as stored:
+                image = stored.copy()
+            # تحديث وقت التعديل حتى يبقى الملف المستخدم حديثاً عند التنظيف
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        self._remember(key, image)
+        return image
+
+    def get_memory(self, url: str, size: Tuple[int, int]) -> Optional[Image.Image]:
+        """البحث في الذاكرة فقط (آمن للاستدعاء من thread الواجهة)"""
+        key = self._key(url, size)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+            return image
+
+    def put(self, url: str, size: Tuple[int, int], image: Image.Image):
+        """تخزين مصغّرة جاهزة في الذاكرة وعلى القرص"""
+        key = self._key(url, size)
+        self._remember(key, image)
+        try:
+            written = self._write_file(self._path(key), image)
+        except OSError as e:
+            print(f"Could not write thumbnail to disk: {e}")
+            return
+
+        with self._lock:
+            self.disk_bytes += written
+            over_budget = self.disk_bytes > self.disk_budget
+        # تنظيف واحد في كل مرة؛ الكتابات الأخرى أثناءه لا تنتظره
+        if over_budget and self._prune_lock.acquire(blocking=False):
+            try:
+                self._prune_disk(int(self.disk_budget * DISK_PRUNE_RATIO))
+            finally:
+                self._prune_lock.release()
+
+    def _remember(self, key: str, image: Image.Image):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.memory_bytes -= self._image_bytes(previous)
+            self._entries[key] = image
+            self.memory_bytes += self._image_bytes(image)
+            # إخراج الأقدم استخداماً حتى نعود تحت الميزانية
+            while self.memory_bytes > self.memory_budget and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.memory_bytes -= self._image_bytes(evicted)
+
+    def _write_file(self, path: str, image: Image.Image) -> int:
+        """كتابة ذرية: ملف مؤقت ثم إعادة تسمية حتى لا يقرأ thread آخر ملفاً ناقصاً؛ تعيد حجم الملف"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                image.save(temp_file, 'PNG', optimize=True)
+                written = temp_file.tell()
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return written
+
+    def _prune_disk(self, target: Optional[int] = None):
+        """حذف أقدم الملفات حتى يعود الحجم تحت الهدف (ميزانية القرص افتراضياً)"""
+        # عند البدء لا توجد كتابات جارية، فالملفات المؤقتة بقايا كتابات انقطعت؛ بعده هي كتابات threads أخرى
+        at_startup = target is None
+        if at_startup:
+            target = self.disk_budget
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith('.tmp') and not at_startup:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total > self.disk_budget:
+            for _, file_size, path in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= file_size
+                except OSError:
+                    pass
+
+        with self._lock:
+            self.disk_bytes = total
+
+# ذاكرة مصغّرات مشتركة بين كل الكائنات داخل التطبيق، تُنشأ عند أول استخدام
+# (إنشاؤها يمسح مجلد القرص، فلا يدفع ثمنه من يستورد الوحدة فقط مثل نافذة الدخول)
+_shared_thumbnail_cache = None
+_shared_thumbnail_cache_lock = threading.Lock()
+
+def get_shared_thumbnail_cache() -> ThumbnailCache:
+    """الحصول على ذاكرة المصغّرات المشتركة"""
+    global _shared_thumbnail_cache
+    with _shared_thumbnail_cache_lock:
+        if _shared_thumbnail_cache is None:
+            _shared_thumbnail_cache = ThumbnailCache()
+        return _shared_thumbnail_cache
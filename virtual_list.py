@@ -0,0 +1,97 @@
+from tkinter import *
+from collections import OrderedDict
+
+class VirtualList(Frame):
+    """قائمة افتراضية بصفوف ثابتة الارتفاع: تُنشأ عناصر الصفوف الظاهرة فقط وتُعاد تعبئتها عند التمرير"""
+
+    def __init__(self, parent, total_count, fetch_page, build_row, bind_row,
+                 row_height=110, page_size=50, max_pages=10, bg='#F8FAFF'):
+        super().__init__(parent, bg=bg)
+        # fetch_page(offset, limit, after) تعيد قائمة العناصر من قاعدة البيانات؛
+        # after آخر عنصر في الصفحة السابقة (إن كان معروفاً) للقراءة من حيث توقفت بدل OFFSET
+        self.fetch_page = fetch_page
+        # build_row(parent) تنشئ صفاً فارغاً، bind_row(row, item) تعبئه بعنصر
+        self.build_row = build_row
+        self.bind_row = bind_row
+        self.row_height = row_height
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.total_count = total_count
+        self._pages = OrderedDict()
+        # آخر عنصر في كل صفحة قُرئت: يبقى بعد حذف الصفحة من الذاكرة
+        self._page_ends = {}
+        self._rows = []
+        self._width = 1
+
+        self.canvas = Canvas(self, bg=bg, highlightthickness=0)
+        self.scrollbar = Scrollbar(self, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.canvas.bind("<Configure>", self._on_resize)
+
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self._update_scrollregion()
+
+    def _update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self._width, self.total_count * self.row_height))
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._layout()
+
+    def _on_resize(self, event):
+        self._width = event.width
+        self._update_scrollregion()
+        # صف إضافي واحد يغطي الجزء الظاهر من الصف التالي
+        needed = event.height // self.row_height + 2
+        while len(self._rows) < needed:
+            row = self.build_row(self.canvas)
+            window_id = self.canvas.create_window(0, 0, window=row, anchor="nw", state='hidden')
+            self._rows.append((row, window_id))
+        for row, window_id in self._rows:
+            self.canvas.itemconfigure(window_id, width=self._width, height=self.row_height)
+        self._layout()
+
+    def _layout(self):
+        """وضع الصفوف المتاحة فوق العناصر الظاهرة حالياً"""
+        first_index = int(self.canvas.canvasy(0) // self.row_height)
+        for slot, (row, window_id) in enumerate(self._rows):
+            index = first_index + slot
+            item = self.get_item(index) if index < self.total_count else None
+            if item is None:
+                self.canvas.itemconfigure(window_id, state='hidden')
+                row.item_index = None
+                continue
+            if getattr(row, 'item_index', None) != index:
+                row.item_index = index
+                self.bind_row(row, item)
+            self.canvas.coords(window_id, 0, index * self.row_height)
+            self.canvas.itemconfigure(window_id, state='normal')
+
+    def get_item(self, index):
+        """العنصر رقم index (تُحمَّل صفحته من قاعدة البيانات عند الحاجة)"""
+        page_number = index // self.page_size
+        page = self._pages.get(page_number)
+        if page is None:
+            after = self._page_ends.get(page_number - 1)
+            page = self.fetch_page(page_number * self.page_size, self.page_size, after)
+            self._pages[page_number] = page
+            if page:
+                self._page_ends[page_number] = page[-1]
+            # الاحتفاظ بعدد محدود من الصفحات في الذاكرة
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_number)
+        offset = index - page_number * self.page_size
+        return page[offset] if offset < len(page) else None
+
+    def refresh(self, total_count):
+        """إعادة تحميل القائمة بعد تغيّر البيانات (حذف عنصر مثلاً)"""
+        self.total_count = total_count
+        self._pages.clear()
+        self._page_ends.clear()
+        for row, _ in self._rows:
+            row.item_index = None
+        self._update_scrollregion()
+        self._layout()